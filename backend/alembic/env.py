@@ -7,7 +7,10 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.models import Base  # Import your declarative Base
+# Import Base and the models only - never app.database, which builds engines
+# and requires DATABASE_URL at import time.
+from app.base import Base  # Import your declarative Base
+import app.models  # noqa: F401  (registers tables on Base.metadata)
 
 # this is the Alembic Config object, which provides access to values within the .ini file
 config = context.config
@@ -16,3 +19,38 @@ config = context.config
 fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata  # Alembic needs this to detect tables
+
+
+def run_migrations_offline() -> None:
+    """Run migrations in 'offline' mode (emit SQL without a DB connection)."""
+    url = config.get_main_option("sqlalchemy.url")
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode against a live connection."""
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,28 @@
+"""add partial index for the penalty cycle lookup
+
+Revision ID: 2d8e4a7c5f13
+Revises: 9b3d6f1e2c84
+Create Date: 2026-10-15 15:41:12.527690
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d8e4a7c5f13'
+down_revision: Union[str, Sequence[str], None] = '9b3d6f1e2c84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_inf_penalties_kart_cat_ts', 'infringements', ['kart_number', 'category', sa.text('timestamp DESC')], unique=False, postgresql_where=sa.text("penalty_due = 'Yes' OR penalty_taken IS NOT NULL"), if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inf_penalties_kart_cat_ts', table_name='infringements')
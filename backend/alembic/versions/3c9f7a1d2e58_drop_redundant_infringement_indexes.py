@@ -0,0 +1,31 @@
+"""drop redundant infringement indexes
+
+Revision ID: 3c9f7a1d2e58
+Revises: a7e2c5d8f391
+Create Date: 2026-10-15 23:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9f7a1d2e58'
+down_revision: Union[str, Sequence[str], None] = 'a7e2c5d8f391'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Superseded by the partial warning/penalty indexes and ix_infr_kart_ts
+    op.drop_index('ix_inf_kart_cat_ts', table_name='infringements', if_exists=True)
+    op.drop_index('ix_infringements_category', table_name='infringements', if_exists=True)
+    op.drop_index('ix_infringements_kart_number', table_name='infringements', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_infringements_kart_number', 'infringements', ['kart_number'], unique=False, if_not_exists=True)
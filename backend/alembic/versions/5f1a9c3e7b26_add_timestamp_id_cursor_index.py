@@ -0,0 +1,30 @@
+"""replace timestamp index with (timestamp, id) cursor index
+
+Revision ID: 5f1a9c3e7b26
+Revises: 2d8e4a7c5f13
+Create Date: 2026-10-15 16:27:48.903115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1a9c3e7b26'
+down_revision: Union[str, Sequence[str], None] = '2d8e4a7c5f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_infr_ts_id', 'infringements', [sa.text('timestamp DESC'), sa.text('id DESC')], unique=False, if_not_exists=True)
+    op.drop_index('ix_infr_ts', table_name='infringements', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_infr_ts', 'infringements', [sa.text('timestamp DESC')], unique=False, if_not_exists=True)
+    op.drop_index('ix_infr_ts_id', table_name='infringements', if_exists=True)
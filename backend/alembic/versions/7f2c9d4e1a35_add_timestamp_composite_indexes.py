@@ -0,0 +1,32 @@
+"""add timestamp composite indexes
+
+Revision ID: 7f2c9d4e1a35
+Revises: 253282c1273d
+Create Date: 2026-10-15 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f2c9d4e1a35'
+down_revision: Union[str, Sequence[str], None] = '253282c1273d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_infr_kart_ts', 'infringements', ['kart_number', sa.text('timestamp DESC')], unique=False, if_not_exists=True)
+    op.create_index('ix_infr_ts', 'infringements', [sa.text('timestamp DESC')], unique=False, if_not_exists=True)
+    op.create_index('ix_hist_inf_ts', 'infringement_history', ['infringement_id', sa.text('timestamp DESC')], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_hist_inf_ts', table_name='infringement_history', if_exists=True)
+    op.drop_index('ix_infr_ts', table_name='infringements', if_exists=True)
+    op.drop_index('ix_infr_kart_ts', table_name='infringements', if_exists=True)
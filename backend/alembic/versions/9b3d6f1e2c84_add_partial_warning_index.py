@@ -0,0 +1,28 @@
+"""add partial index for warning accumulation
+
+Revision ID: 9b3d6f1e2c84
+Revises: e5a7c3d19b42
+Create Date: 2026-10-15 14:02:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3d6f1e2c84'
+down_revision: Union[str, Sequence[str], None] = 'e5a7c3d19b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_inf_warnings_kart_cat_ts', 'infringements', ['kart_number', 'category', sa.text('timestamp DESC')], unique=False, postgresql_where=sa.text("penalty_description = 'Warning'"), if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inf_warnings_kart_cat_ts', table_name='infringements')
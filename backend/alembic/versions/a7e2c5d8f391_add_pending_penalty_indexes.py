@@ -0,0 +1,30 @@
+"""add partial indexes for pending penalties
+
+Revision ID: a7e2c5d8f391
+Revises: 5f1a9c3e7b26
+Create Date: 2026-10-15 18:05:33.640812
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e2c5d8f391'
+down_revision: Union[str, Sequence[str], None] = '5f1a9c3e7b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_inf_pending_ts', 'infringements', ['timestamp'], unique=False, postgresql_where=sa.text("penalty_due = 'Yes'"), if_not_exists=True)
+    op.create_index('ix_inf_pending_kart', 'infringements', ['kart_number'], unique=False, postgresql_where=sa.text("penalty_due = 'Yes'"), if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inf_pending_kart', table_name='infringements', if_exists=True)
+    op.drop_index('ix_inf_pending_ts', table_name='infringements', if_exists=True)
@@ -0,0 +1,28 @@
+"""add sessions status active index
+
+Revision ID: c41e8b2f6d90
+Revises: 7f2c9d4e1a35
+Create Date: 2026-10-15 10:03:27.551942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e8b2f6d90'
+down_revision: Union[str, Sequence[str], None] = '7f2c9d4e1a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_sessions_status_active', 'sessions', ['status'], unique=False, postgresql_where=sa.text("status = 'active'"), if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sessions_status_active', table_name='sessions', if_exists=True)
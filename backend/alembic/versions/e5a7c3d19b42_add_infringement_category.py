@@ -0,0 +1,36 @@
+"""add infringement category
+
+Revision ID: e5a7c3d19b42
+Revises: c41e8b2f6d90
+Create Date: 2026-10-15 11:20:05.804316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c3d19b42'
+down_revision: Union[str, Sequence[str], None] = 'c41e8b2f6d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE infringements ADD COLUMN IF NOT EXISTS category VARCHAR")
+    # Backfill with the same rules as app.utils.infringement_category
+    op.execute("""
+        UPDATE infringements SET category = CASE
+            WHEN description ILIKE '%white line infringement%' THEN 'white_line'
+            WHEN description ILIKE '%yellow zone%' THEN 'yellow_zone'
+            ELSE 'other'
+        END
+        WHERE category IS NULL
+    """)
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE infringements DROP COLUMN IF EXISTS category")
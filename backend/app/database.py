@@ -1,16 +1,17 @@
 import os
+import time
+import functools
+import threading
 import logging
+from collections import OrderedDict
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from .base import Base
+from sqlalchemy.pool import NullPool
+from sqlalchemy.exc import DBAPIError, DisconnectionError
+from sqlalchemy.schema import CreateIndex
 from dotenv import load_dotenv
-from .models import Base, SessionInfo, AppConfig
-
-def init_db():
-    """Initialize control DB tables if they don’t exist."""
-    from sqlalchemy import create_engine
-    engine = _control_engine
-    Base.metadata.create_all(bind=engine)
+from .base import Base
+from .models import SessionInfo, Infringement, InfringementHistory
 
 # Load environment variables
 load_dotenv()
@@ -23,8 +24,46 @@ CONTROL_DB_URL = os.getenv("DATABASE_URL")
 if not CONTROL_DB_URL:
     raise ValueError("❌ DATABASE_URL not found in environment variables.")
 
+# Server URL without the database name; session DB URLs are built from it
+_BASE_URL = CONTROL_DB_URL.rsplit("/", 1)[0]
+
+@functools.lru_cache(maxsize=64)
+def _session_db_name(session_name: str) -> str:
+    """Map a session name to its database name."""
+    return f"{session_name.lower().replace(' ', '_')}_db"
+
+# Connection pool sizing for the active session engine.
+# Connection budget against PostgreSQL's max_connections (default 100, 3 reserved for superusers):
+# only the active session engine and the control engine keep full pools; cached engines for other
+# sessions are trimmed to one warm connection when they stop being active or finish a read such as
+# an export. Worst case: DB_POOL_SIZE + DB_MAX_OVERFLOW (50) + DB_CONTROL_POOL_SIZE +
+# DB_CONTROL_MAX_OVERFLOW (15) + ENGINE_CACHE_SIZE - 1 (7), plus one connection per running export
+# or session creation. Keep the sum under max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "30"))
+# The control DB only serves session bookkeeping and config lookups, most of them cached in-process
+DB_CONTROL_POOL_SIZE = int(os.getenv("DB_CONTROL_POOL_SIZE", "5"))
+DB_CONTROL_MAX_OVERFLOW = int(os.getenv("DB_CONTROL_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+
+def _make_engine(url: str, pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW, **kwargs):
+    """Create an engine with the configured QueuePool sizing, compiled-query cache and pre-ping enabled."""
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_use_lifo=True,  # reuse the most recently returned connection rather than cycling through all of them
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        query_cache_size=DB_QUERY_CACHE_SIZE,
+        **kwargs
+    )
+
 # Engines and session factories
-_control_engine = create_engine(CONTROL_DB_URL, pool_pre_ping=True)
+_control_engine = _make_engine(CONTROL_DB_URL, pool_size=DB_CONTROL_POOL_SIZE, max_overflow=DB_CONTROL_MAX_OVERFLOW)
 ControlSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_control_engine)
 
 # Global pointers to active session DB
@@ -32,73 +71,233 @@ _active_engine = _control_engine
 ActiveSessionLocal = ControlSessionLocal
 _current_session_name = None  # Track which session we're currently on
 
-# --- Database Access ---
-def get_db():
-    """Return a session bound to the current active DB."""
-    # Ensure we're using the correct session database
-    # Check control DB for active session and switch if needed
+# Guards engine creation/swaps across worker threads
+_switch_lock = threading.RLock()
+
+# Per-session engines, most recently used last. Inactive ones keep one warm connection (_trim_pool)
+ENGINE_CACHE_SIZE = int(os.getenv("ENGINE_CACHE_SIZE", "8"))
+_engine_cache = OrderedDict()  # session name -> (engine, sessionmaker)
+
+# Active-session lookup cache: avoids a control-DB round-trip on every request.
+# Refreshed at most once per TTL, and immediately whenever switch_session_db runs.
+ACTIVE_SESSION_CACHE_TTL = float(os.getenv("ACTIVE_SESSION_CACHE_TTL", "5.0"))
+_active_session_cache = {"name": None, "checked_at": 0.0}
+
+def _update_active_session_cache(session_name):
+    """Record the active session name and reset the cache TTL."""
+    _active_session_cache["name"] = session_name
+    _active_session_cache["checked_at"] = time.monotonic()
+
+def invalidate_active_session_cache():
+    """Force the next get_session_db() call to re-read the active session from the control DB."""
+    _active_session_cache["checked_at"] = 0.0
+
+def _sync_active_session():
+    """Look up the active session in the control DB and point the active engine at it."""
     global _current_session_name, _active_engine, ActiveSessionLocal
+    control_db = ControlSessionLocal()
     try:
-        control_db = ControlSessionLocal()
+        active_session = control_db.query(SessionInfo).filter(SessionInfo.status == "active").first()
+        active_name = active_session.name if active_session else None
+    finally:
+        control_db.close()
+
+    if active_name:
+        if _current_session_name != active_name:
+            try:
+                switch_session_db(active_name)
+                logger.debug("Switched to active session: %s", active_name)
+            except Exception as e:
+                logger.warning("Could not switch to active session '%s': %s", active_name, e)
+                return
+    elif _current_session_name is not None:
+        # No active session - reset to control DB
+        _trim_pool(_active_engine)
+        _active_engine = _control_engine
+        ActiveSessionLocal = ControlSessionLocal
+        _current_session_name = None
+    _update_active_session_cache(active_name)
+
+def _active_session_cache_stale() -> bool:
+    cache_age = time.monotonic() - _active_session_cache["checked_at"]
+    return cache_age >= ACTIVE_SESSION_CACHE_TTL or _active_session_cache["name"] != _current_session_name
+
+def _ensure_active_session():
+    """Re-sync the active engine with the control DB once the cached lookup has expired."""
+    # Stale pooled connections are handled by pool_pre_ping, so the control DB
+    # only needs to be consulted when the cached lookup has expired.
+    if not _active_session_cache_stale():
+        return
+    with _switch_lock:
+        # Another thread may have refreshed the lookup while we waited for the lock
+        if not _active_session_cache_stale():
+            return
         try:
-            active_session = control_db.query(SessionInfo).filter(SessionInfo.status == "active").first()
-            if active_session:
-                # Always switch to ensure we're on the correct session
-                # This handles cases where the engine was disposed or reset
-                if _current_session_name != active_session.name:
-                    try:
-                        switch_session_db(active_session.name)
-                        _current_session_name = active_session.name
-                        logger.debug(f"Switched to active session: {active_session.name}")
-                    except Exception as e:
-                        logger.warning(f"Could not switch to active session '{active_session.name}': {e}")
-                else:
-                    # Even if we think we're on the right session, verify the engine is valid
-                    # by attempting a simple query to ensure the connection works
-                    try:
-                        # Test the engine with a simple query
-                        test_db = ActiveSessionLocal()
-                        try:
-                            # Just verify we can connect - don't query anything specific
-                            test_db.execute(text("SELECT 1"))
-                        finally:
-                            test_db.close()
-                    except Exception as e:
-                        # Engine might be invalid, force a switch
-                        logger.warning(f"Engine validation failed, forcing switch: {e}")
-                        try:
-                            switch_session_db(active_session.name)
-                            _current_session_name = active_session.name
-                        except Exception as e2:
-                            logger.error(f"Failed to force switch: {e2}")
-            else:
-                # No active session - reset to control DB
-                if _current_session_name is not None:
-                    _active_engine = _control_engine
-                    ActiveSessionLocal = ControlSessionLocal
-                    _current_session_name = None
-        finally:
-            control_db.close()
+            _sync_active_session()
+        except Exception as e:
+            logger.warning("Error checking active session: %s", e)
+
+def _handle_lost_connection(e: Exception):
+    """If a handler failed because the DB connection dropped, rebuild the session engine on the next request."""
+    # Routes usually re-raise DB errors as HTTPException, so also look at the chained error
+    for err in (e, e.__context__):
+        if isinstance(err, DisconnectionError) or (isinstance(err, DBAPIError) and err.connection_invalidated):
+            session_name = _current_session_name
+            logger.warning("Lost connection to session DB '%s', forcing re-switch: %s", session_name, err)
+            if session_name:
+                dispose_session_engine(session_name)
+            invalidate_active_session_cache()
+            return
+
+# --- Database Access ---
+def get_control_db():
+    """Return a session bound to the control DB. Never resolves the active session."""
+    db = ControlSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_session_db():
+    """
+    Return a session bound to the current active DB.
+    Pending work is committed when the handler returns and rolled back if it raises.
+    """
+    _ensure_active_session()
+    db = ActiveSessionLocal()
+    try:
+        yield db
+        db.commit()
     except Exception as e:
-        logger.warning(f"Error checking active session: {e}")
-    
+        db.rollback()
+        _handle_lost_connection(e)
+        raise
+    finally:
+        db.close()
+
+def get_session_db_readonly():
+    """
+    Return a read-only session bound to the current active DB.
+    Use with Depends(get_session_db_readonly, scope="function") so the connection is
+    returned to the pool before the response is sent.
+    """
+    _ensure_active_session()
     db = ActiveSessionLocal()
     try:
+        db.connection(execution_options={"postgresql_readonly": True})
         yield db
+    except Exception as e:
+        _handle_lost_connection(e)
+        raise
     finally:
         db.close()
 
 # --- Session Management ---
-def switch_session_db(session_name: str):
+def _trim_pool(engine):
     """
-    Switch the active engine to a specific session database.
-    Raises ValueError if DB does not exist.
+    Close all but one of an engine's idle pooled connections; the engine stays usable and cached.
+    The kept connection is returned last, so the LIFO pool hands it out first when the session is used again.
+    Connections checked out meanwhile go back to the pool when their requests finish.
     """
+    if engine is _control_engine:
+        return
+    try:
+        pool = engine.pool
+        idle = [pool.connect() for _ in range(pool.checkedin())]
+        for conn in idle[1:]:
+            conn.invalidate()  # closes the DBAPI connection; the pool slot reconnects lazily
+            conn.close()
+        if idle:
+            idle[0].close()
+    except Exception as e:
+        logger.warning("Error trimming pool for '%s': %s", engine.url.database, e)
+
+def _evict_session_engines(keep=None):
+    """Dispose least-recently-used session engines beyond ENGINE_CACHE_SIZE, never the active one or `keep`."""
+    for name in list(_engine_cache):
+        if len(_engine_cache) <= max(ENGINE_CACHE_SIZE, 1):
+            break
+        engine, _ = _engine_cache[name]
+        if engine is _active_engine or name == keep:
+            continue
+        del _engine_cache[name]
+        try:
+            engine.dispose()
+            logger.info("Disposed cached engine for session '%s'", name)
+        except Exception as e:
+            logger.warning("Error disposing cached engine for session '%s': %s", name, e)
+
+def dispose_session_engine(session_name: str):
+    """Drop a session's cached engine, e.g. before its database is deleted."""
     global _active_engine, ActiveSessionLocal, _current_session_name
+    with _switch_lock:
+        cached = _engine_cache.pop(session_name, None)
+        if not cached:
+            return
+        engine, _ = cached
+        if engine is _active_engine:
+            _active_engine = _control_engine
+            ActiveSessionLocal = ControlSessionLocal
+            _current_session_name = None
+        try:
+            engine.dispose()
+        except Exception as e:
+            logger.warning("Error disposing engine for session '%s': %s", session_name, e)
+
+# Same rules as utils.infringement_category, for rows written before the column existed
+_BACKFILL_CATEGORY_SQL = """
+    UPDATE infringements SET category = CASE
+        WHEN description ILIKE '%white line infringement%' THEN 'white_line'
+        WHEN description ILIKE '%yellow zone%' THEN 'yellow_zone'
+        ELSE 'other'
+    END
+    WHERE category IS NULL
+"""
+
+# Indexes earlier releases created that the current models no longer define
+_OBSOLETE_INDEXES = ("ix_infringements_kart_number", "ix_infringements_category", "ix_inf_kart_cat_ts")
+
+def _upgrade_session_schema(engine):
+    """
+    Bring a session DB up to the current models.
+    Session DBs are built by create_all when the session starts, not by Alembic, so databases
+    from older releases lack later columns and indexes. Only missing objects are created,
+    and indexes the models have dropped are removed.
+    """
+    with engine.begin() as conn:
+        columns = set(conn.execute(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'infringements'"
+        )).scalars())
+        if columns and "category" not in columns:
+            conn.execute(text("ALTER TABLE infringements ADD COLUMN category VARCHAR"))
+            conn.execute(text(_BACKFILL_CATEGORY_SQL))
+            logger.info("Added and backfilled infringements.category in '%s'", engine.url.database)
+
+        existing_indexes = set(conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename IN ('infringements', 'infringement_history')"
+        )).scalars())
+        for table in (Infringement.__table__, InfringementHistory.__table__):
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+                    logger.info("Created index %s in '%s'", index.name, engine.url.database)
+        for index_name in _OBSOLETE_INDEXES:
+            if index_name in existing_indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+                logger.info("Dropped index %s in '%s'", index_name, engine.url.database)
+
+def _session_engine(session_name: str):
+    """
+    Return the (engine, sessionmaker) pair for a session, creating and caching it if needed.
+    Does not change the active session. Call with _switch_lock held.
+    Raises ValueError if DB does not exist.
+    """
+    # Cached engines are dropped before their database is deleted, so no existence check is needed
+    if session_name in _engine_cache:
+        _engine_cache.move_to_end(session_name)
+        return _engine_cache[session_name]
 
-    session_db_name = f"{session_name.lower().replace(' ', '_')}_db"
-    base_url = CONTROL_DB_URL.rsplit("/", 1)[0]
-    session_db_url = f"{base_url}/{session_db_name}"
+    session_db_name = _session_db_name(session_name)
 
     # Check if the session DB exists
     with _control_engine.connect() as conn:
@@ -109,37 +308,73 @@ def switch_session_db(session_name: str):
         if not exists:
             raise ValueError(f"Session database '{session_db_name}' does not exist")
 
-    # Only create new engine if we're switching to a different session
-    # Reuse engine if already on this session
-    if _current_session_name != session_name:
-        # Dispose of old engine if it's not the control engine
-        if _active_engine is not _control_engine:
-            try:
-                _active_engine.dispose(close=True)
-            except Exception as e:
-                logger.warning(f"Error disposing old engine: {e}")
-        
-        # Switch active engine & session factory
-        # Create a fresh engine with connection pool reset
-        # Use echo=False to avoid logging all SQL, but enable pool_pre_ping
-        _active_engine = create_engine(
-            session_db_url, 
-            pool_pre_ping=True,
-            pool_reset_on_return='commit',  # Reset connections on return to pool
-            echo=False
-        )
-        ActiveSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_active_engine)
-        _current_session_name = session_name
-        logger.info(f"Switched active DB to session '{session_name}' (engine created)")
-    else:
-        logger.debug(f"Already on session '{session_name}', skipping switch")
+    # Use echo=False to avoid logging all SQL, but enable pool_pre_ping
+    engine = _make_engine(
+        f"{_BASE_URL}/{session_db_name}",
+        pool_reset_on_return='commit',  # Reset connections on return to pool
+        echo=False
+    )
+    # Upgrade before caching the engine, so a failure leaves nothing half-initialized behind
+    try:
+        _upgrade_session_schema(engine)
+    except Exception:
+        engine.dispose()
+        raise
+    _engine_cache[session_name] = (engine, sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    logger.info("Created engine for session '%s'", session_name)
+    _evict_session_engines(keep=session_name)
+    return _engine_cache[session_name]
+
+def switch_session_db(session_name: str):
+    """
+    Switch the active engine to a specific session database.
+    Raises ValueError if DB does not exist.
+    """
+    global _active_engine, ActiveSessionLocal, _current_session_name
+
+    # Serialize engine swaps so concurrent callers create at most one engine per session
+    with _switch_lock:
+        # Only swap engines if we're switching to a different session
+        # Previously used engines stay in an LRU cache with one warm connection instead of being disposed
+        if _current_session_name == session_name:
+            logger.debug("Already on session '%s', skipping switch", session_name)
+        else:
+            engine, session_factory = _session_engine(session_name)
+            # Only the active engine keeps a full pool; see the connection budget above
+            _trim_pool(_active_engine)
+            _active_engine, ActiveSessionLocal = engine, session_factory
+            _current_session_name = session_name
+            logger.info("Switched active DB to session '%s'", session_name)
+        _update_active_session_cache(session_name)
+
+def open_session_db(session_name: str):
+    """
+    Return a new session bound to a session's database without making it the active session.
+    For reads of a session other than the live one (e.g. export). The caller closes it.
+    Raises ValueError if DB does not exist.
+    """
+    with _switch_lock:
+        _, session_factory = _session_engine(session_name)
+    return session_factory()
+
+def release_session_db(session_name: str):
+    """Trim the pool left by open_session_db() to one warm connection, unless the session is the active one."""
+    with _switch_lock:
+        cached = _engine_cache.get(session_name)
+        if cached and cached[0] is not _active_engine:
+            _trim_pool(cached[0])
+
+def warm_active_engine():
+    """Open one pooled connection on the active engine so the first request doesn't pay for it."""
+    with _active_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
 
 def create_session_db(session_name: str):
     """
     Create a new database for a session and initialize tables.
     Raises Exception if DB already exists.
     """
-    session_db_name = f"{session_name.lower().replace(' ', '_')}_db"
+    session_db_name = _session_db_name(session_name)
 
     # --- Connect to control DB with AUTOCOMMIT for CREATE DATABASE ---
     with _control_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
@@ -155,21 +390,28 @@ def create_session_db(session_name: str):
         conn.execute(text(f"CREATE DATABASE {session_db_name};"))
 
     # --- Initialize tables in the new session DB ---
-    session_db_url = f"{CONTROL_DB_URL.rsplit('/', 1)[0]}/{session_db_name}"
-    engine = create_engine(session_db_url, pool_pre_ping=True)
-
-    from .models import Infringement, InfringementHistory  # per-session models
-    Base.metadata.create_all(bind=engine)
-
-    logger.info(f"Session database '{session_db_name}' created and tables initialized.")
+    session_db_url = f"{_BASE_URL}/{session_db_name}"
+    # One-shot DDL: no pool to keep around afterwards
+    engine = create_engine(session_db_url, poolclass=NullPool)
 
+    try:
+        Base.metadata.create_all(bind=engine)
+    finally:
+        engine.dispose()
 
+    logger.info("Session database '%s' created and tables initialized.", session_db_name)
 
 # --- Initialize Control DB Tables ---
-def init_control_db():
+_control_tables_created = False  # set once init_db() has run in this process
+
+def init_db():
     """
     Initializes tables in the control database (sessions and app_config tables).
+    Runs create_all at most once per process.
     """
-    from .models import SessionInfo, AppConfig  # Control DB models
+    global _control_tables_created
+    if _control_tables_created:
+        return
     Base.metadata.create_all(bind=_control_engine)
+    _control_tables_created = True
     logger.info("Control database tables initialized.")
@@ -0,0 +1,56 @@
+import logging
+import threading
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import InfringementHistory
+
+logger = logging.getLogger(__name__)
+
+# History rows waiting to be written, as (engine, values) pairs
+_history_buffer = []
+_history_buffer_lock = threading.Lock()
+_history_flush_lock = threading.Lock()
+
+def _insert_rows_individually(engine, rows):
+    """
+    Insert rows one savepoint at a time, skipping the ones that violate a constraint.
+    Used when a batch fails, e.g. because one row's infringement was deleted before the flush.
+    """
+    with Session(bind=engine) as db:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(InfringementHistory), [row])
+            except IntegrityError as e:
+                logger.warning("Dropped history row for infringement %s: %s", row.get("infringement_id"), e.orig)
+        db.commit()
+
+def write_history(bind, *rows: dict):
+    """
+    Queue audit rows and flush everything pending as one multi-row INSERT per engine.
+    Runs as a background task after the response is sent; the infringements are already committed.
+    Pass all of a request's rows in one call so they share a single INSERT.
+    Rows queued by concurrent requests while a flush is running go out with the next flush.
+    """
+    with _history_buffer_lock:
+        _history_buffer.extend((bind, values) for values in rows)
+    with _history_flush_lock:
+        with _history_buffer_lock:
+            pending = list(_history_buffer)
+            _history_buffer.clear()
+        # pending may be empty if an earlier flusher already picked up our row
+        by_engine = {}
+        for engine, row in pending:
+            by_engine.setdefault(engine, []).append(row)
+        for engine, rows in by_engine.items():
+            try:
+                try:
+                    with Session(bind=engine) as db:
+                        db.execute(insert(InfringementHistory), rows)
+                        db.commit()
+                except IntegrityError:
+                    # One bad row fails the whole INSERT; keep the unrelated rows
+                    _insert_rows_individually(engine, rows)
+            except Exception as e:
+                logger.error("Failed to write %d infringement history row(s): %s", len(rows), e, exc_info=True)
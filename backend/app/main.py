@@ -1,21 +1,31 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from .routes import session, infringements, penalties, history, infringement_log
 from .ws_manager import manager
-from .database import init_db, switch_session_db, ControlSessionLocal
+from .database import init_db, switch_session_db, warm_active_engine, ControlSessionLocal, DB_POOL_SIZE, DB_MAX_OVERFLOW
 from .models import SessionInfo
 from .vars import get_warning_expiry_minutes, set_warning_expiry_minutes
 from pydantic import BaseModel
+import anyio
+import asyncio
 import logging
-import json
+import orjson
+import os
 
 logger = logging.getLogger(__name__)
 
+# Sync route handlers and DB dependencies run in AnyIO's worker threads.
+# Size that pool to the DB connection pool so DB-bound requests aren't capped at AnyIO's default of 40.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
 # --- Startup: Restore active session ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
     # --- Initialize control database ---
     # Only the control DB tracks session metadata
     init_db()
@@ -28,6 +38,7 @@ async def lifespan(app: FastAPI):
             if active_session:
                 try:
                     switch_session_db(active_session.name)
+                    warm_active_engine()
                     logger.info(f"Restored active session: {active_session.name}")
                 except Exception as e:
                     logger.warning(f"Could not restore active session '{active_session.name}': {e}")
@@ -36,14 +47,22 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Error restoring active session on startup: {e}")
     
+    flusher = asyncio.create_task(manager.run_flusher())
+
     yield
-    # Shutdown (if needed)
+
+    # Shutdown
+    flusher.cancel()
 
 # --- FastAPI app ---
-app = FastAPI(title="Karting Infringement System", version="1.1", lifespan=lifespan)
+app = FastAPI(
+    title="Karting Infringement System",
+    version="1.1",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 # --- CORS Middleware ---
-import os
 cors_origins = os.getenv("CORS_ORIGINS", "*")
 # Convert comma-separated string to list, or use ["*"] if "*" is specified
 if cors_origins == "*":
@@ -102,7 +121,7 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         await manager.connect(websocket)
         # Send a welcome message to confirm connection
-        await websocket.send_text(json.dumps({"type": "connected", "message": "WebSocket connection established"}))
+        await websocket.send_text(orjson.dumps({"type": "connected", "message": "WebSocket connection established"}).decode())
         
         while True:
             # Keep connection alive by receiving messages (client may send ping/heartbeat)
@@ -120,12 +139,3 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {e}", exc_info=True)
         await manager.disconnect(websocket)
-
-# --- Optional: auto-switch to default session on startup ---
-# Uncomment if you want the app to automatically switch to a default session
-# default_session = "default"
-# try:
-#     switch_session_db(default_session)
-# except Exception as e:
-#     import logging
-#     logging.warning(f"Could not switch to default session: {e}")
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 
-Base = declarative_base()
+from .base import Base
 
 # === Control DB Model ===
 class SessionInfo(Base):
@@ -12,6 +12,11 @@ class SessionInfo(Base):
     started_at = Column(DateTime(timezone=True))
     status = Column(String)  # "active" or "closed"
 
+    __table_args__ = (
+        # Partial index: the active-session lookup touches a single tuple
+        Index("ix_sessions_status_active", status, postgresql_where=(status == "active")),
+    )
+
 class AppConfig(Base):
     __tablename__ = "app_config"
     id = Column(Integer, primary_key=True)
@@ -24,9 +29,10 @@ class Infringement(Base):
     __tablename__ = "infringements"
     id = Column(Integer, primary_key=True, index=True)
     session_name = Column(String, index=True)
-    kart_number = Column(Integer, index=True)
+    kart_number = Column(Integer)  # covered by ix_infr_kart_ts
     turn_number = Column(String, nullable=True)
     description = Column(String)
+    category = Column(String)  # "white_line", "yellow_zone" or "other"
     observer = Column(String, nullable=True)
     warning_count = Column(Integer, default=0)
     penalty_due = Column(String, default="No")  # "Yes" or "No"
@@ -36,7 +42,27 @@ class Infringement(Base):
     history = relationship(
         "InfringementHistory",
         back_populates="infringement",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        lazy="raise",  # never loaded implicitly; query history explicitly
+        passive_deletes=True  # history rows are removed by the ON DELETE CASCADE foreign key
+    )
+
+    __table_args__ = (
+        Index("ix_infr_kart_ts", kart_number, timestamp.desc()),
+        Index("ix_infr_ts_id", timestamp.desc(), id.desc()),  # list order and keyset cursor
+        # Warning accumulation only counts rows logged as plain warnings
+        Index(
+            "ix_inf_warnings_kart_cat_ts", kart_number, category, timestamp.desc(),
+            postgresql_where=(penalty_description == "Warning")
+        ),
+        # Cycle start lookup: latest pending or applied penalty for a kart/category
+        Index(
+            "ix_inf_penalties_kart_cat_ts", kart_number, category, timestamp.desc(),
+            postgresql_where=(penalty_due == "Yes") | penalty_taken.isnot(None)
+        ),
+        # Pending penalties are few; /penalties/pending and apply-by-kart only touch these rows
+        Index("ix_inf_pending_ts", timestamp, postgresql_where=(penalty_due == "Yes")),
+        Index("ix_inf_pending_kart", kart_number, postgresql_where=(penalty_due == "Yes")),
     )
 
 class InfringementHistory(Base):
@@ -50,3 +76,7 @@ class InfringementHistory(Base):
     details = Column(String, nullable=True)
     timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     infringement = relationship("Infringement", back_populates="history")
+
+    __table_args__ = (
+        Index("ix_hist_inf_ts", infringement_id, timestamp.desc()),
+    )
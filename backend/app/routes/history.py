@@ -1,29 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy import exists
 from typing import List
 
-from ..database import get_db
+from ..database import get_session_db_readonly
 from ..models import Infringement, InfringementHistory
 from ..schemas import InfringementHistoryResponse
 
 router = APIRouter(tags=["History"])
 
 @router.get("/{kart_number}", response_model=List[InfringementHistoryResponse])
-def get_history(kart_number: int, db: Session = Depends(get_db)):
+def get_history(kart_number: int, db: Session = Depends(get_session_db_readonly, scope="function")):
     """Get infringement history for a specific kart in the current session DB."""
 
-    infringements = db.query(Infringement).filter(
-        Infringement.kart_number == kart_number
-    ).all()
-
-    if not infringements:
-        raise HTTPException(status_code=404, detail="Infringement not found for this kart.")
-
     history_records = (
         db.query(InfringementHistory)
-        .filter(InfringementHistory.infringement_id.in_([inf.id for inf in infringements]))
+        .join(Infringement, InfringementHistory.infringement_id == Infringement.id)
+        .filter(Infringement.kart_number == kart_number)
         .order_by(InfringementHistory.timestamp.desc())
         .all()
     )
 
+    # Only pay for the existence check when the join came back empty
+    if not history_records:
+        kart_exists = db.query(exists().where(Infringement.kart_number == kart_number)).scalar()
+        if not kart_exists:
+            raise HTTPException(status_code=404, detail="Infringement not found for this kart.")
+
     return history_records
@@ -1,27 +1,44 @@
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import select, func
+from ..database import get_session_db_readonly
 from ..models import Infringement
 
 router = APIRouter()
 
-@router.get("/", response_model=list[dict])
-def list_infringement_log(db: Session = Depends(get_db)):
-    """Returns all infringement logs for the current session DB."""
+# ISO-8601 in UTC, matching datetime.isoformat() output for timezone-aware values
+_ISO_UTC_FORMAT = 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"'
 
-    logs = db.query(Infringement).order_by(Infringement.timestamp.desc()).all()
+def _iso_utc(column):
+    """Format a timestamptz column as an ISO string in PostgreSQL so Python never builds datetimes."""
+    return func.to_char(func.timezone("UTC", column), _ISO_UTC_FORMAT).label(column.key)
 
-    return [
-        {
-            "id": infr.id,
-            "kart_number": infr.kart_number,
-            "turn_number": infr.turn_number,
-            "description": infr.description,
-            "observer": infr.observer,
-            "warning_count": infr.warning_count,
-            "penalty_due": infr.penalty_due,
-            "penalty_taken": infr.penalty_taken.isoformat() if infr.penalty_taken else None,
-            "timestamp": infr.timestamp.isoformat() if infr.timestamp else None,
-        }
-        for infr in logs
-    ]
+@router.get("/")
+def list_infringement_log(limit: int = 100, offset: int = 0, db: Session = Depends(get_session_db_readonly, scope="function")):
+    """Returns infringement logs for the current session DB, newest first, one page at a time."""
+
+    # Clamp pagination parameters
+    limit = min(max(limit, 1), 1000)
+    offset = max(offset, 0)
+
+    # Plain column rows instead of ORM instances, with timestamps already rendered as strings
+    result = db.execute(
+        select(
+            Infringement.id,
+            Infringement.kart_number,
+            Infringement.turn_number,
+            Infringement.description,
+            Infringement.observer,
+            Infringement.warning_count,
+            Infringement.penalty_due,
+            _iso_utc(Infringement.penalty_taken),
+            _iso_utc(Infringement.timestamp),
+        )
+        .order_by(Infringement.timestamp.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+
+    # Row._asdict() builds each dict in SQLAlchemy's compiled row code; orjson can't take RowMapping directly
+    return ORJSONResponse([row._asdict() for row in result])
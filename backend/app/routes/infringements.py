@@ -1,37 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, aliased, load_only
 from sqlalchemy.exc import ProgrammingError, OperationalError
-from sqlalchemy import or_
+from sqlalchemy import or_, func, insert, select, text, tuple_
 from datetime import datetime, timezone, timedelta
-import json, logging
+from typing import Optional
+import logging
 
-from ..database import get_db
+from ..database import get_session_db, get_session_db_readonly
 from ..models import Infringement, InfringementHistory
 from ..schemas import InfringementCreate, InfringementResponse
 from ..ws_manager import manager
-from ..vars import get_warning_expiry_minutes
+from ..history_writer import write_history
+from ..vars import get_warning_expiry
+from ..utils import infringement_category, handle_db_error, WHITE_LINE, YELLOW_ZONE
 
 router = APIRouter(tags=["Infringements"])
 logger = logging.getLogger(__name__)
 
-def handle_db_error(e: Exception):
-    """Handle database errors and return user-friendly HTTP exceptions."""
-    error_str = str(e).lower()
-    if "relation" in error_str and "does not exist" in error_str:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No active session. Please create or load a session first."
-        )
-    elif "does not exist" in error_str:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Database error: Table does not exist. Please ensure a session is active."
-        )
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Database error: {str(e)}"
-        )
+# Accumulated warnings (including the current one) that turn into a penalty
+WARNINGS_PER_PENALTY = 3
+
+# Upper bound on rows accepted by POST /bulk
+MAX_BULK_INFRINGEMENTS = 1000
+
+# Columns declared by InfringementResponse; list/stream queries load only these
+_RESPONSE_COLUMNS = load_only(
+    Infringement.id, Infringement.kart_number, Infringement.turn_number, Infringement.description,
+    Infringement.observer, Infringement.warning_count, Infringement.penalty_due,
+    Infringement.penalty_description, Infringement.penalty_taken, Infringement.timestamp
+)
 
 def _normalize_turn_number(value):
     """Allow turn_number to be provided as int or string; store as trimmed string or None."""
@@ -43,8 +41,94 @@ def _normalize_turn_number(value):
     except Exception:
         return None
 
+def _lock_kart_warnings(db: Session, kart_number: int, category: str):
+    """
+    Serialize warning accumulation for one kart/category until the transaction ends.
+    Without it, two observers logging the same kart at once can both count two prior
+    warnings and both raise the third-warning penalty.
+    """
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(:kart_number, hashtext(:category))"),
+        {"kart_number": kart_number, "category": category}
+    )
+
+def _prior_warning_count(db: Session, kart_number: int, category: str, expiry_threshold: datetime, exclude_id: Optional[int] = None) -> int:
+    """
+    Count the kart's unexpired warnings in the current cycle, in one statement.
+    A cycle restarts at the most recent pending or applied penalty for the category;
+    GREATEST ignores the NULL when there is none, leaving just the expiry threshold.
+    The count saturates at WARNINGS_PER_PENALTY - 1, enough to tell whether the new entry
+    triggers a penalty, so the stored warning_count never exceeds WARNINGS_PER_PENALTY.
+    """
+    # Aliased so the subquery isn't auto-correlated to the outer infringements FROM
+    penalty = aliased(Infringement)
+    last_penalty = select(func.max(penalty.timestamp)).where(
+        penalty.kart_number == kart_number,
+        penalty.category == category,
+        or_(
+            penalty.penalty_due == "Yes",  # Pending penalty
+            (penalty.penalty_due == "No") & (penalty.penalty_taken.isnot(None))  # Applied penalty
+        )
+    )
+    warnings = select(Infringement.id).where(
+        Infringement.kart_number == kart_number,
+        Infringement.category == category,
+        Infringement.penalty_description == "Warning"  # Only count warnings, exclude penalty entries (both pending and applied)
+    )
+    if exclude_id is not None:
+        last_penalty = last_penalty.where(penalty.id != exclude_id)
+        warnings = warnings.where(Infringement.id != exclude_id)
+    warnings = warnings.where(
+        Infringement.timestamp >= func.greatest(last_penalty.scalar_subquery(), expiry_threshold)
+    ).limit(WARNINGS_PER_PENALTY - 1)
+    return db.scalar(select(func.count()).select_from(warnings.subquery()))
+
+def _accumulates_warnings(category: str, incoming_penalty_lower: str) -> bool:
+    """White line and yellow zone entries logged as a warning (or with no penalty given) accumulate towards a penalty."""
+    return category in (WHITE_LINE, YELLOW_ZONE) and incoming_penalty_lower in ("", "warning")
+
+def _new_infringement_outcome(category: str, penalty_text: Optional[str], prior_warnings: int) -> tuple:
+    """
+    Decide (warning_count, penalty_due, penalty_description) for a new infringement.
+    - White line / yellow zone warnings: 3 unexpired warnings in a cycle = penalty (prior_warnings
+      comes from _prior_warning_count; white line and yellow zone are tracked separately).
+    - White line / yellow zone with an explicit penalty: honor it.
+    - All other infringements: use penalty_description from payload if provided.
+    """
+    incoming_penalty = (penalty_text or "").strip()
+    incoming_penalty_lower = incoming_penalty.lower()
+    if _accumulates_warnings(category, incoming_penalty_lower):
+        warning_count = prior_warnings + 1  # +1 for current one
+        if warning_count >= WARNINGS_PER_PENALTY:
+            return warning_count, "Yes", "5 sec Stop & Go"
+        return warning_count, "No", "Warning"
+    if category in (WHITE_LINE, YELLOW_ZONE):
+        # "No further action" means no penalty is due
+        penalty_due = "No" if incoming_penalty_lower == "no further action" else "Yes"
+        return 1, penalty_due, incoming_penalty
+    if penalty_text:
+        # "No further action" or "Warning" means no penalty is due
+        penalty_due = "No" if incoming_penalty_lower in ("no further action", "warning") else "Yes"
+        return 1, penalty_due, penalty_text
+    return 1, "No", None
+
+def _infringement_event_data(inf: Infringement) -> dict:
+    """Full row for WebSocket events, so clients can apply the change without refetching the list."""
+    return {
+        "id": inf.id,
+        "kart_number": inf.kart_number,
+        "turn_number": inf.turn_number,
+        "description": inf.description,
+        "observer": inf.observer,
+        "warning_count": inf.warning_count,
+        "penalty_due": inf.penalty_due,
+        "penalty_description": inf.penalty_description,
+        "penalty_taken": inf.penalty_taken,
+        "timestamp": inf.timestamp
+    }
+
 @router.post("/", response_model=InfringementResponse)
-def create_infringement(payload: InfringementCreate, db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
+def create_infringement(payload: InfringementCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_session_db)):
     """
     Create an infringement with proper warning/penalty logic.
     - White line: accumulates warnings (expire after 180 minutes), 3 warnings = penalty.
@@ -54,170 +138,148 @@ def create_infringement(payload: InfringementCreate, db: Session = Depends(get_d
     try:
         # Handle optional description - default to empty string if not provided
         description = payload.description or ""
-        desc_lower = description.strip().lower() if description else ""
+        category = infringement_category(description)
+        incoming_penalty_lower = (payload.penalty_description or "").strip().lower()
         now = datetime.now(timezone.utc)
-        expiry_threshold = now - timedelta(minutes=get_warning_expiry_minutes())
-
-        warning_count = 0
-        penalty_due = "No"
-        penalty_description = None
-
-        if desc_lower and "white line infringement" in desc_lower:
-            # White line: honor provided penalty_description; only run warning accumulation when it's a warning
-            incoming_penalty = (payload.penalty_description or "").strip()
-            if incoming_penalty and incoming_penalty.lower() != "warning":
-                warning_count = 1
-                # "No further action" means no penalty is due
-                if incoming_penalty.lower() == "no further action":
-                    penalty_due = "No"
-                else:
-                    penalty_due = "Yes"
-                penalty_description = incoming_penalty
-            else:
-                # Warning path: special accumulation (180 min expiry, 3 warnings = penalty)
-                # Only count warnings that haven't triggered a penalty yet (penalty_due != "Yes")
-                # This allows the warning count to reset after a penalty is due (pending)
-                # penalty_due == "Yes" resets the cycle, but we also need to find applied penalties
-                # to know where the cycle started. We use penalty_taken only to identify applied penalties.
-                last_penalty = db.query(Infringement).filter(
-                    Infringement.kart_number == payload.kart_number,
-                    Infringement.description.ilike("%white line infringement%"),
-                    or_(
-                        Infringement.penalty_due == "Yes",  # Pending penalty
-                        (Infringement.penalty_due == "No") & (Infringement.penalty_taken.isnot(None))  # Applied penalty
-                    )
-                ).order_by(Infringement.timestamp.desc()).first()
-
-                cycle_start = expiry_threshold
-                if last_penalty:
-                    cycle_start = max(expiry_threshold, last_penalty.timestamp)
-
-                valid_white_infringements = db.query(Infringement).filter(
-                    Infringement.kart_number == payload.kart_number,
-                    Infringement.description.ilike("%white line infringement%"),
-                    Infringement.timestamp >= cycle_start,
-                    Infringement.penalty_description == "Warning"  # Only count warnings, exclude penalty entries (both pending and applied)
-                ).order_by(Infringement.timestamp.desc()).all()
-
-                warning_count = len(valid_white_infringements) + 1  # +1 for current one
-
-                if warning_count >= 3:
-                    penalty_due = "Yes"
-                    penalty_description = "5 sec Stop & Go"
-                else:
-                    penalty_due = "No"
-                    penalty_description = "Warning"
-
-        elif desc_lower and "yellow zone" in desc_lower:
-            # Yellow zone: honor provided penalty_description; only run warning accumulation when it's a warning
-            incoming_penalty = (payload.penalty_description or "").strip()
-            if incoming_penalty and incoming_penalty.lower() != "warning":
-                warning_count = 1
-                # "No further action" means no penalty is due
-                if incoming_penalty.lower() == "no further action":
-                    penalty_due = "No"
-                else:
-                    penalty_due = "Yes"
-                penalty_description = incoming_penalty
-            else:
-                # Warning path: special accumulation (180 min expiry, 3 warnings = penalty)
-                # Only count warnings that haven't triggered a penalty yet (penalty_due != "Yes")
-                # This allows the warning count to reset after a penalty is due (pending)
-                # Yellow zone is tracked separately from white line
-                # penalty_due == "Yes" resets the cycle, but we also need to find applied penalties
-                # to know where the cycle started. We use penalty_taken only to identify applied penalties.
-                last_penalty = db.query(Infringement).filter(
-                    Infringement.kart_number == payload.kart_number,
-                    Infringement.description.ilike("%yellow zone%"),
-                    or_(
-                        Infringement.penalty_due == "Yes",  # Pending penalty
-                        (Infringement.penalty_due == "No") & (Infringement.penalty_taken.isnot(None))  # Applied penalty
-                    )
-                ).order_by(Infringement.timestamp.desc()).first()
-
-                cycle_start = expiry_threshold
-                if last_penalty:
-                    cycle_start = max(expiry_threshold, last_penalty.timestamp)
-
-                valid_yellow_infringements = db.query(Infringement).filter(
-                    Infringement.kart_number == payload.kart_number,
-                    Infringement.description.ilike("%yellow zone%"),
-                    Infringement.timestamp >= cycle_start,
-                    Infringement.penalty_description == "Warning"  # Only count warnings, exclude penalty entries (both pending and applied)
-                ).order_by(Infringement.timestamp.desc()).all()
-
-                warning_count = len(valid_yellow_infringements) + 1  # +1 for current one
-
-                if warning_count >= 3:
-                    penalty_due = "Yes"
-                    penalty_description = "5 sec Stop & Go"
-                else:
-                    penalty_due = "No"
-                    penalty_description = "Warning"
-
-        else:
-            # All other infringements (yellow zone, generic, etc.): use penalty_description from payload
-            warning_count = 1
-            if payload.penalty_description:
-                desc = payload.penalty_description.strip().lower()
-                # "No further action" or "Warning" means no penalty is due
-                if desc in ["no further action", "warning"]:
-                    penalty_due = "No"
-                    penalty_description = payload.penalty_description
-                else:
-                    penalty_due = "Yes"
-                    penalty_description = payload.penalty_description
-            else:
-                penalty_due = "No"
-                penalty_description = None
-
-        # Create infringement record
-        new_inf = Infringement(
-            kart_number=payload.kart_number,
-            turn_number=_normalize_turn_number(payload.turn_number),
-            description=description,
-            observer=payload.observer,
-            warning_count=warning_count,
-            penalty_due=penalty_due,
-            penalty_description=penalty_description,
-            penalty_taken=None,
-            timestamp=now
+        expiry_threshold = now - get_warning_expiry()
+
+        prior_warnings = 0
+        if _accumulates_warnings(category, incoming_penalty_lower):
+            # Serialize with other writers for this kart/category, then count the current cycle
+            _lock_kart_warnings(db, payload.kart_number, category)
+            prior_warnings = _prior_warning_count(db, payload.kart_number, category, expiry_threshold)
+        warning_count, penalty_due, penalty_description = _new_infringement_outcome(
+            category, payload.penalty_description, prior_warnings
         )
-        db.add(new_inf)
+
+        # Create infringement record (Core insert: compiled once per shape and cached).
+        # RETURNING hands back the whole row, so no follow-up SELECT is needed.
+        row = db.execute(
+            insert(Infringement).values(
+                kart_number=payload.kart_number,
+                turn_number=_normalize_turn_number(payload.turn_number),
+                description=description,
+                category=category,
+                observer=payload.observer,
+                warning_count=warning_count,
+                penalty_due=penalty_due,
+                penalty_description=penalty_description,
+                penalty_taken=None,
+                timestamp=now
+            ).returning(*Infringement.__table__.c)
+        ).mappings().one()
         db.commit()
-        db.refresh(new_inf)
+        new_inf = Infringement(**row)
+        new_id = new_inf.id
 
-        # Record in history
+        # Record in history once the response is out
         performed_by = payload.performed_by or "System"
-        history = InfringementHistory(
-            infringement_id=new_inf.id,
-            action="created",
-            performed_by=performed_by,
-            observer=payload.observer,
-            details=f"{description} | warning_count={warning_count} | penalty_due={penalty_due} | penalty_description={penalty_description}",
-            timestamp=now
+        background_tasks.add_task(write_history, db.get_bind(), {
+            "infringement_id": new_id,
+            "action": "created",
+            "performed_by": performed_by,
+            "observer": payload.observer,
+            "details": f"{description} | warning_count={warning_count} | penalty_due={penalty_due} | penalty_description={penalty_description}",
+            "timestamp": now
+        })
+
+        # manager.enqueue is a coroutine, so it is awaited on the event loop after
+        # the response is sent; bursts of writes are coalesced into one frame
+        background_tasks.add_task(manager.enqueue, {
+            "type": "new_infringement",
+            "data": _infringement_event_data(new_inf)
+        })
+
+        return new_inf
+    except (ProgrammingError, OperationalError) as e:
+        db.rollback()
+        handle_db_error(e)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating infringement: {str(e)}"
         )
-        db.add(history)
-        db.commit()
 
-        # Broadcast asynchronously - FastAPI should always inject BackgroundTasks
-        if background_tasks:
-            background_tasks.add_task(manager.broadcast, json.dumps({
+
+@router.post("/bulk", response_model=list[InfringementResponse])
+def create_infringements_bulk(payloads: list[InfringementCreate], background_tasks: BackgroundTasks, db: Session = Depends(get_session_db)):
+    """
+    Create several infringements in one transaction, in the order given.
+    Warning/penalty logic is the same as POST /: prior warnings are counted once per
+    kart/category, then carried forward in memory across the batch, and all rows are
+    written with a single multi-row INSERT ... RETURNING.
+    """
+    if len(payloads) > MAX_BULK_INFRINGEMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_INFRINGEMENTS} infringements per request.")
+    if not payloads:
+        return []
+    try:
+        now = datetime.now(timezone.utc)
+        expiry_threshold = now - get_warning_expiry()
+
+        prepared = []
+        for payload in payloads:
+            description = payload.description or ""
+            category = infringement_category(description)
+            incoming_penalty_lower = (payload.penalty_description or "").strip().lower()
+            prepared.append((payload, description, category, _accumulates_warnings(category, incoming_penalty_lower)))
+
+        # Lock in a fixed order so concurrent bulk requests can't deadlock, then count each cycle once
+        prior = {}
+        for key in sorted({(payload.kart_number, category) for payload, _, category, accumulates in prepared if accumulates}):
+            _lock_kart_warnings(db, *key)
+            prior[key] = _prior_warning_count(db, *key, expiry_threshold)
+
+        rows = []
+        for i, (payload, description, category, accumulates) in enumerate(prepared):
+            key = (payload.kart_number, category)
+            warning_count, penalty_due, penalty_description = _new_infringement_outcome(
+                category, payload.penalty_description, prior.get(key, 0)
+            )
+            if key in prior:
+                # A penalty starts a new cycle for the rest of the batch
+                prior[key] = 0 if penalty_due == "Yes" else prior[key] + (1 if accumulates else 0)
+            rows.append({
+                "kart_number": payload.kart_number,
+                "turn_number": _normalize_turn_number(payload.turn_number),
+                "description": description,
+                "category": category,
+                "observer": payload.observer,
+                "warning_count": warning_count,
+                "penalty_due": penalty_due,
+                "penalty_description": penalty_description,
+                "penalty_taken": None,
+                # Distinct, ordered timestamps keep later cycle lookups consistent with the batch order
+                "timestamp": now + timedelta(microseconds=i)
+            })
+
+        result = db.execute(
+            insert(Infringement).returning(*Infringement.__table__.c, sort_by_parameter_order=True),
+            rows
+        ).mappings().all()
+        db.commit()
+        new_infs = [Infringement(**row) for row in result]
+
+        # One history task for the whole batch: a single multi-row INSERT after the response
+        background_tasks.add_task(write_history, db.get_bind(), *(
+            {
+                "infringement_id": new_inf.id,
+                "action": "created",
+                "performed_by": payload.performed_by or "System",
+                "observer": payload.observer,
+                "details": f"{new_inf.description} | warning_count={new_inf.warning_count} | penalty_due={new_inf.penalty_due} | penalty_description={new_inf.penalty_description}",
+                "timestamp": new_inf.timestamp
+            }
+            for payload, new_inf in zip(payloads, new_infs)
+        ))
+        for new_inf in new_infs:
+            background_tasks.add_task(manager.enqueue, {
                 "type": "new_infringement",
-                "data": {
-                    "id": new_inf.id,
-                    "kart_number": new_inf.kart_number,
-                    "description": new_inf.description,
-                    "warning_count": new_inf.warning_count,
-                    "penalty_due": new_inf.penalty_due,
-                    "penalty_description": new_inf.penalty_description,
-                    "timestamp": new_inf.timestamp.isoformat()
-                }
-            }))
-        else:
-            logger.warning("BackgroundTasks not available - WebSocket broadcast skipped")
+                "data": _infringement_event_data(new_inf)
+            })
 
-        return new_inf
+        return new_infs
     except (ProgrammingError, OperationalError) as e:
         db.rollback()
         handle_db_error(e)
@@ -225,7 +287,7 @@ def create_infringement(payload: InfringementCreate, db: Session = Depends(get_d
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error creating infringement: {str(e)}"
+            detail=f"Error creating infringements: {str(e)}"
         )
 
 
@@ -233,17 +295,18 @@ def create_infringement(payload: InfringementCreate, db: Session = Depends(get_d
 def list_infringements(
     page: int = 1,
     limit: int = 300,
-    db: Session = Depends(get_db)
+    before_ts: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    db: Session = Depends(get_session_db_readonly, scope="function")
 ):
-    """List infringements in the active session database with pagination."""
+    """
+    List infringements in the active session database with pagination, newest first.
+    - page/limit: offset pagination (default).
+    - before_ts/before_id: keyset pagination; returns rows after the (timestamp, id) cursor
+      in list order, plus next_before_ts/next_before_id for the following page.
+      before_id breaks ties between rows sharing a timestamp; before_ts alone is still accepted.
+    """
     try:
-        # Log the database URL being used
-        db_url = str(db.bind.url) if hasattr(db.bind, 'url') else 'unknown'
-        logger.info(f"list_infringements: Using database: {db_url}, page={page}, limit={limit}")
-        
-        # Ensure we're in a fresh transaction - commit any pending changes
-        db.commit()
-        
         # Validate pagination parameters
         if page < 1:
             page = 1
@@ -252,22 +315,41 @@ def list_infringements(
         if limit > 1000:
             limit = 1000  # Max limit to prevent abuse
         
-        # Get total count
-        total_count = db.query(Infringement).count()
-        logger.info(f"list_infringements: Total count: {total_count}")
-        
-        # Calculate pagination
         offset = (page - 1) * limit
+        if before_ts is not None:
+            # Keyset: walk the timestamp index instead of skipping OFFSET rows.
+            # The total covers the whole table, so it needs its own count.
+            total_count = db.query(func.count(Infringement.id)).scalar()
+            if before_id is not None:
+                cursor = tuple_(Infringement.timestamp, Infringement.id) < tuple_(before_ts, before_id)
+            else:
+                cursor = Infringement.timestamp < before_ts
+            infringements = db.query(Infringement).options(_RESPONSE_COLUMNS).filter(
+                cursor
+            ).order_by(Infringement.timestamp.desc(), Infringement.id.desc()).limit(limit).all()
+        else:
+            # COUNT(*) OVER () returns the table total alongside each row of the page
+            rows = db.query(Infringement, func.count().over().label("total")).options(_RESPONSE_COLUMNS).order_by(
+                Infringement.timestamp.desc(), Infringement.id.desc()
+            ).offset(offset).limit(limit).all()
+            infringements = [row[0] for row in rows]
+            if rows:
+                total_count = rows[0].total
+            elif offset:
+                # Page past the end: no row to carry the total
+                total_count = db.query(func.count(Infringement.id)).scalar()
+            else:
+                total_count = 0
         total_pages = (total_count + limit - 1) // limit if total_count > 0 else 1
+        has_more = len(infringements) == limit
+        next_before_ts = infringements[-1].timestamp.isoformat() if has_more else None
+        next_before_id = infringements[-1].id if has_more else None
         
-        # Fetch paginated results
-        infringements = db.query(Infringement)\
-            .order_by(Infringement.timestamp.desc())\
-            .offset(offset)\
-            .limit(limit)\
-            .all()
-        
-        logger.info(f"list_infringements: Returning {len(infringements)} infringements (page {page}/{total_pages})")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "list_infringements: db=%s returning %d of %d (page %d/%d, limit %d)",
+                db.bind.url.render_as_string(hide_password=True), len(infringements), total_count, page, total_pages, limit
+            )
         
         # Return with pagination metadata
         return {
@@ -275,7 +357,9 @@ def list_infringements(
             "total": total_count,
             "page": page,
             "limit": limit,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "next_before_ts": next_before_ts,
+            "next_before_id": next_before_id
         }
     except (ProgrammingError, OperationalError) as e:
         handle_db_error(e)
@@ -284,15 +368,37 @@ def list_infringements(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching infringements: {str(e)}"
         )
+
+
+@router.get("/stream")
+def stream_infringements(db: Session = Depends(get_session_db_readonly)):
+    """Stream every infringement in the active session as NDJSON, newest first, without buffering the list."""
+    try:
+        # Iterating executes the query here, so DB errors surface before streaming starts
+        rows = iter(
+            db.query(Infringement).options(_RESPONSE_COLUMNS)
+            .order_by(Infringement.timestamp.desc()).yield_per(500)
+        )
+    except (ProgrammingError, OperationalError) as e:
+        handle_db_error(e)
+
+    def generate():
+        for inf in rows:
+            yield InfringementResponse.model_validate(inf).model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.put("/{infringement_id}", response_model=InfringementResponse)
 def update_infringement(
     infringement_id: int,
     payload: InfringementCreate,
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = None
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_session_db)
 ):
     """Update an infringement while keeping warning/penalty logic consistent and broadcasting updates."""
     try:
+        now = datetime.now(timezone.utc)
         inf = db.query(Infringement).filter(Infringement.id == infringement_id).first()
         if not inf:
             raise HTTPException(status_code=404, detail="Infringement not found")
@@ -307,58 +413,41 @@ def update_infringement(
         # Keep original timestamp to reflect when the infringement was first logged
 
         # --- Re-evaluate logic (same as create) ---
-        desc_lower = description.strip().lower() if description else ""
-        now = datetime.now(timezone.utc)
-        expiry_threshold = now - timedelta(minutes=get_warning_expiry_minutes())
+        category = infringement_category(description)
+        # The description may have moved the row into or out of a warning category
+        inf.category = category
+        incoming_penalty = (payload.penalty_description or "").strip()
+        incoming_penalty_lower = incoming_penalty.lower()
+        expiry_threshold = now - get_warning_expiry()
         warning_count = 0
         penalty_due = "No"
         penalty_description = None
 
-        if desc_lower and "white line infringement" in desc_lower:
+        if category == WHITE_LINE:
             # White line: special warning accumulation logic (180 min expiry, 3 warnings = penalty)
             # Get *non-expired* white line infringements for this kart (excluding current one)
             # Only count warnings that haven't triggered a penalty yet (penalty_due != "Yes")
             # This allows the warning count to reset after a penalty is due (pending)
             # penalty_due == "Yes" resets the cycle, but we also need to find applied penalties
             # to know where the cycle started. We use penalty_taken only to identify applied penalties.
-            last_penalty = db.query(Infringement).filter(
-                Infringement.kart_number == payload.kart_number,
-                Infringement.description.ilike("%white line infringement%"),
-                or_(
-                    Infringement.penalty_due == "Yes",  # Pending penalty
-                    (Infringement.penalty_due == "No") & (Infringement.penalty_taken.isnot(None))  # Applied penalty
-                ),
-                Infringement.id != inf.id,
-            ).order_by(Infringement.timestamp.desc()).first()
-
-            cycle_start = expiry_threshold
-            if last_penalty:
-                cycle_start = max(expiry_threshold, last_penalty.timestamp)
-
-            valid_white_infringements = db.query(Infringement).filter(
-                Infringement.kart_number == payload.kart_number,
-                Infringement.description.ilike("%white line infringement%"),
-                Infringement.timestamp >= cycle_start,
-                Infringement.id != inf.id,
-                Infringement.penalty_description == "Warning"  # Only count warnings, exclude penalty entries (both pending and applied)
-            ).order_by(Infringement.timestamp.desc()).all()
-
-            warning_count = len(valid_white_infringements) + 1  # +1 for current one
-
-            if warning_count >= 3:
+            _lock_kart_warnings(db, payload.kart_number, WHITE_LINE)
+            prior_warnings = _prior_warning_count(db, payload.kart_number, WHITE_LINE, expiry_threshold, exclude_id=inf.id)
+
+            warning_count = prior_warnings + 1  # +1 for current one
+
+            if warning_count >= WARNINGS_PER_PENALTY:
                 penalty_due = "Yes"
                 penalty_description = "5 sec Stop & Go"
             else:
                 penalty_due = "No"
                 penalty_description = "Warning"
 
-        elif desc_lower and "yellow zone" in desc_lower:
+        elif category == YELLOW_ZONE:
             # Yellow zone: honor provided penalty_description; only run warning accumulation when it's a warning
-            incoming_penalty = (payload.penalty_description or "").strip()
-            if incoming_penalty and incoming_penalty.lower() != "warning":
+            if incoming_penalty and incoming_penalty_lower != "warning":
                 warning_count = 1
                 # "No further action" means no penalty is due
-                if incoming_penalty.lower() == "no further action":
+                if incoming_penalty_lower == "no further action":
                     penalty_due = "No"
                 else:
                     penalty_due = "Yes"
@@ -371,31 +460,12 @@ def update_infringement(
                 # Yellow zone is tracked separately from white line
                 # penalty_due == "Yes" resets the cycle, but we also need to find applied penalties
                 # to know where the cycle started. We use penalty_taken only to identify applied penalties.
-                last_penalty = db.query(Infringement).filter(
-                    Infringement.kart_number == payload.kart_number,
-                    Infringement.description.ilike("%yellow zone%"),
-                    or_(
-                        Infringement.penalty_due == "Yes",  # Pending penalty
-                        (Infringement.penalty_due == "No") & (Infringement.penalty_taken.isnot(None))  # Applied penalty
-                    ),
-                    Infringement.id != inf.id,
-                ).order_by(Infringement.timestamp.desc()).first()
-
-                cycle_start = expiry_threshold
-                if last_penalty:
-                    cycle_start = max(expiry_threshold, last_penalty.timestamp)
-
-                valid_yellow_infringements = db.query(Infringement).filter(
-                    Infringement.kart_number == payload.kart_number,
-                    Infringement.description.ilike("%yellow zone%"),
-                    Infringement.timestamp >= cycle_start,
-                    Infringement.id != inf.id,
-                    Infringement.penalty_description == "Warning"  # Only count warnings, exclude penalty entries (both pending and applied)
-                ).order_by(Infringement.timestamp.desc()).all()
-
-                warning_count = len(valid_yellow_infringements) + 1  # +1 for current one
-
-            if warning_count >= 3:
+                _lock_kart_warnings(db, payload.kart_number, YELLOW_ZONE)
+                prior_warnings = _prior_warning_count(db, payload.kart_number, YELLOW_ZONE, expiry_threshold, exclude_id=inf.id)
+
+                warning_count = prior_warnings + 1  # +1 for current one
+
+            if warning_count >= WARNINGS_PER_PENALTY:
                 penalty_due = "Yes"
                 penalty_description = "5 sec Stop & Go"
             else:
@@ -405,9 +475,8 @@ def update_infringement(
             # All other infringements (yellow zone, generic, etc.): use penalty_description from payload
             warning_count = 1
             if payload.penalty_description:
-                desc = payload.penalty_description.strip().lower()
                 # "No further action" or "Warning" means no penalty is due
-                if desc in ["no further action", "warning"]:
+                if incoming_penalty_lower in ("no further action", "warning"):
                     penalty_due = "No"
                     penalty_description = payload.penalty_description
                 else:
@@ -421,36 +490,26 @@ def update_infringement(
         inf.penalty_due = penalty_due
         inf.penalty_description = penalty_description
 
+        # Every column was just set here, so keep the loaded values instead of re-SELECTing after commit
+        db.expire_on_commit = False
         db.commit()
-        db.refresh(inf)
 
-        # --- Add to history ---
+        # --- Add to history once the response is out ---
         performed_by = payload.performed_by or "System"
-        history = InfringementHistory(
-            infringement_id=inf.id,
-            action="updated",
-            performed_by=performed_by,
-            observer=payload.observer,
-            details=f"Updated infringement {inf.id}: {description} | warning_count={warning_count} | penalty_due={penalty_due}",
-            timestamp=datetime.now(timezone.utc)
-        )
-        db.add(history)
-        db.commit()
+        background_tasks.add_task(write_history, db.get_bind(), {
+            "infringement_id": inf.id,
+            "action": "updated",
+            "performed_by": performed_by,
+            "observer": payload.observer,
+            "details": f"Updated infringement {inf.id}: {description} | warning_count={warning_count} | penalty_due={penalty_due}",
+            "timestamp": now
+        })
 
         # --- Broadcast update ---
-        if background_tasks:
-            background_tasks.add_task(manager.broadcast, json.dumps({
-                "type": "update_infringement",
-                "data": {
-                    "id": inf.id,
-                    "kart_number": inf.kart_number,
-                    "description": inf.description,
-                    "warning_count": inf.warning_count,
-                    "penalty_due": inf.penalty_due,
-                    "penalty_description": inf.penalty_description,
-                    "timestamp": inf.timestamp.isoformat()
-                }
-            }))
+        background_tasks.add_task(manager.enqueue, {
+            "type": "update_infringement",
+            "data": _infringement_event_data(inf)
+        })
 
         return inf
     except (ProgrammingError, OperationalError) as e:
@@ -467,7 +526,7 @@ def update_infringement(
 
 
 @router.delete("/{infringement_id}")
-def delete_infringement(infringement_id: int, db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
+def delete_infringement(infringement_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_session_db)):
     """Delete an infringement, record in history, and broadcast removal."""
     try:
         inf = db.query(Infringement).filter(Infringement.id == infringement_id).first()
@@ -475,6 +534,7 @@ def delete_infringement(infringement_id: int, db: Session = Depends(get_db), bac
             raise HTTPException(status_code=404, detail="Infringement not found")
 
         # --- Record history before deletion ---
+        # Kept in the request transaction: the row must still exist for the history foreign key
         history = InfringementHistory(
             infringement_id=infringement_id,
             action="deleted",
@@ -489,13 +549,12 @@ def delete_infringement(infringement_id: int, db: Session = Depends(get_db), bac
         db.commit()
 
         # --- Broadcast delete ---
-        if background_tasks:
-            background_tasks.add_task(manager.broadcast, json.dumps({
-                "type": "delete_infringement",
-                "data": {
-                    "id": infringement_id
-                }
-            }))
+        background_tasks.add_task(manager.enqueue, {
+            "type": "delete_infringement",
+            "data": {
+                "id": infringement_id
+            }
+        })
 
         return {"status": "deleted", "id": infringement_id}
     except (ProgrammingError, OperationalError) as e:
@@ -1,109 +1,100 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import select, update, case, bindparam
 from sqlalchemy.exc import ProgrammingError, OperationalError
 from datetime import datetime, timezone
-from ..database import get_db
-from ..models import Infringement, InfringementHistory
+import hashlib
+import orjson
+from ..database import get_session_db, get_session_db_readonly
+from ..models import Infringement
 from ..schemas import ApplyPenaltyRequest, ApplyPenaltyResponse
 from ..ws_manager import manager
-import json
+from ..history_writer import write_history
+from ..utils import handle_db_error, WHITE_LINE
 
 router = APIRouter(tags=["Penalties"])
 
-def handle_db_error(e: Exception):
-    """Handle database errors and return user-friendly HTTP exceptions."""
-    error_str = str(e).lower()
-    if "relation" in error_str and "does not exist" in error_str:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No active session. Please create or load a session first."
-        )
-    elif "does not exist" in error_str:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Database error: Table does not exist. Please ensure a session is active."
-        )
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Database error: {str(e)}"
-        )
+# Apply statements are built once at import; each request only binds its values.
+# Clearing a pending penalty also resets the warning count when it is a white line one.
+_CLEAR_PENDING = (
+    update(Infringement)
+    .where(Infringement.penalty_due == "Yes")
+    .values(
+        penalty_due="No",
+        penalty_taken=bindparam("taken_at"),
+        warning_count=case((Infringement.category == WHITE_LINE, 0), else_=Infringement.warning_count)
+    )
+    .execution_options(synchronize_session=False)
+)
+# Bind names must differ from the updated columns, so the kart is bound as b_kart_number
+_APPLY_FOR_KART = _CLEAR_PENDING.where(Infringement.kart_number == bindparam("b_kart_number")).returning(Infringement.id)
+_APPLY_ONE = _CLEAR_PENDING.where(Infringement.id == bindparam("infringement_id")).returning(
+    Infringement.id, Infringement.kart_number, Infringement.penalty_description
+)
 
 @router.post("/apply/{kart_number}", response_model=ApplyPenaltyResponse)
-def apply_all_penalties(kart_number: int, payload: ApplyPenaltyRequest, db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
-    infringements = db.query(Infringement).filter(
-        Infringement.kart_number == kart_number
-    ).all()
-
-    pending = [inf for inf in infringements if inf.penalty_due == "Yes"]
-    if not pending:
-        raise HTTPException(status_code=400, detail="No pending penalty for this kart.")
-
+def apply_all_penalties(kart_number: int, payload: ApplyPenaltyRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_session_db, scope="function")):
     now = datetime.now(timezone.utc)
-    for inf in pending:
-        inf.penalty_due = "No"
-        inf.penalty_taken = now
-        if "white line infringement" in inf.description.lower():
-            inf.warning_count = 0
-        db.add(inf)
-    db.commit()
+    # One UPDATE finds and clears all of the kart's pending penalties; white line warnings reset
+    # in the same statement. RETURNING gives the affected ids, so no SELECT is needed first.
+    pending_ids = db.execute(_APPLY_FOR_KART, {"b_kart_number": kart_number, "taken_at": now}).scalars().all()
+    if not pending_ids:
+        raise HTTPException(status_code=400, detail="No pending penalty for this kart.")
 
-    db.add(InfringementHistory(
-        infringement_id=pending[-1].id,
-        action="penalty_applied",
-        performed_by=payload.performed_by,
-        observer=None,
-        details="Penalty applied and warnings reset if white line.",
-        timestamp=now
-    ))
     db.commit()
 
-    if background_tasks:
-        background_tasks.add_task(manager.broadcast, json.dumps({
-            "type": "penalty_applied",
-            "data": {"kart_number": kart_number, "penalty_taken": now.isoformat()}
-        }))
+    # Record in history once the response is out
+    background_tasks.add_task(write_history, db.get_bind(), {
+        "infringement_id": pending_ids[-1],
+        "action": "penalty_applied",
+        "performed_by": payload.performed_by,
+        "observer": None,
+        "details": "Penalty applied and warnings reset if white line.",
+        "timestamp": now
+    })
+
+    background_tasks.add_task(manager.enqueue, {
+        "type": "penalty_applied",
+        "data": {
+            "kart_number": kart_number,
+            "infringement_ids": pending_ids,
+            "penalty_taken": now
+        }
+    })
 
     return ApplyPenaltyResponse(kart_number=kart_number, status="All pending penalties applied")
 
 
 @router.post("/apply_individual/{infringement_id}", response_model=ApplyPenaltyResponse)
-def apply_individual_penalty(infringement_id: int, payload: ApplyPenaltyRequest, db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
-    inf = db.query(Infringement).filter(
-        Infringement.id == infringement_id
-    ).first()
-
-    if not inf or inf.penalty_due != "Yes":
-        raise HTTPException(status_code=400, detail="No pending penalty for this infringement.")
-
+def apply_individual_penalty(infringement_id: int, payload: ApplyPenaltyRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_session_db, scope="function")):
     now = datetime.now(timezone.utc)
-    inf.penalty_due = "No"
-    inf.penalty_taken = now
-    if "white line infringement" in inf.description.lower():
-        inf.warning_count = 0
-    db.add(inf)
-    db.commit()
-
-    db.add(InfringementHistory(
-        infringement_id=inf.id,
-        action="penalty_applied",
-        performed_by=payload.performed_by,
-        observer=None,
-        details=f"Individual penalty applied: {inf.penalty_description}",
-        timestamp=now
-    ))
+    # The pending check is the UPDATE's WHERE clause: a no-op request (already applied,
+    # unknown id) matches nothing and returns no row, with no SELECT beforehand
+    inf = db.execute(_APPLY_ONE, {"infringement_id": infringement_id, "taken_at": now}).first()
+    if inf is None:
+        raise HTTPException(status_code=400, detail="No pending penalty for this infringement.")
     db.commit()
 
-    if background_tasks:
-        background_tasks.add_task(manager.broadcast, json.dumps({
-            "type": "penalty_applied",
-            "data": {
-                "kart_number": inf.kart_number,
-                "infringement_id": inf.id,
-                "penalty_description": inf.penalty_description,
-                "penalty_taken": now.isoformat()
-            }
-        }))
+    # Record in history once the response is out
+    background_tasks.add_task(write_history, db.get_bind(), {
+        "infringement_id": inf.id,
+        "action": "penalty_applied",
+        "performed_by": payload.performed_by,
+        "observer": None,
+        "details": f"Individual penalty applied: {inf.penalty_description}",
+        "timestamp": now
+    })
+
+    background_tasks.add_task(manager.enqueue, {
+        "type": "penalty_applied",
+        "data": {
+            "kart_number": inf.kart_number,
+            "infringement_id": inf.id,
+            "penalty_description": inf.penalty_description,
+            "penalty_taken": now
+        }
+    })
 
     return ApplyPenaltyResponse(
         kart_number=inf.kart_number,
@@ -113,24 +104,41 @@ def apply_individual_penalty(infringement_id: int, payload: ApplyPenaltyRequest,
     )
 
 
-@router.get("/pending", response_model=list[dict])
-def get_pending_penalties(db: Session = Depends(get_db)):
+# Plain column rows instead of ORM instances: only the six fields the pending list uses
+_PENDING_PENALTIES = (
+    select(
+        Infringement.id,
+        Infringement.kart_number,
+        Infringement.description,
+        Infringement.penalty_description,
+        Infringement.timestamp,
+        Infringement.observer,
+    )
+    .where(Infringement.penalty_due == "Yes")
+    .order_by(Infringement.timestamp.asc())
+)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag (weak or strong)."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+
+@router.get("/pending")
+def get_pending_penalties(request: Request, db: Session = Depends(get_session_db_readonly, scope="function")):
     try:
-        pending = db.query(Infringement).filter(
-            Infringement.penalty_due == "Yes"
-        ).order_by(Infringement.timestamp.asc()).all()
-
-        return [
-            {
-                "id": inf.id,
-                "kart_number": inf.kart_number,
-                "description": inf.description,
-                "penalty_description": inf.penalty_description,
-                "timestamp": inf.timestamp.isoformat(),
-                "observer": inf.observer
-            }
-            for inf in pending
-        ]
+        result = db.execute(_PENDING_PENALTIES)
+
+        # Serialized straight by orjson (datetimes included), skipping response_model validation and jsonable_encoder
+        body = orjson.dumps([row._asdict() for row in result])
+        # Pending rows can be edited in place (no updated_at to key on), so the ETag is
+        # taken from the body itself; polling clients get a bodiless 304 while nothing changed
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
     except (ProgrammingError, OperationalError) as e:
         handle_db_error(e)
     except Exception as e:
@@ -138,3 +146,19 @@ def get_pending_penalties(db: Session = Depends(get_db)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching pending penalties: {str(e)}"
         )
+
+
+@router.get("/pending/stream")
+def stream_pending_penalties(db: Session = Depends(get_session_db_readonly)):
+    """Stream pending penalties as NDJSON, oldest first, without buffering the list."""
+    try:
+        # Executing here surfaces DB errors before streaming starts; rows are fetched 500 at a time
+        rows = db.execute(_PENDING_PENALTIES.execution_options(yield_per=500))
+    except (ProgrammingError, OperationalError) as e:
+        handle_db_error(e)
+
+    def generate():
+        for row in rows:
+            yield orjson.dumps(row._asdict()) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
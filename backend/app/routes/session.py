@@ -1,35 +1,42 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import select, text
 from datetime import datetime, timezone
-from dateutil import parser as date_parser
-import os, json, tempfile, shutil, logging
+import os, io, tempfile, shutil, logging
+from collections import defaultdict
 
 from ..database import (
-    get_db,
+    get_control_db,
     create_session_db,
     switch_session_db,
-    ControlSessionLocal,
+    open_session_db,
+    release_session_db,
+    invalidate_active_session_cache,
+    dispose_session_engine,
+    _session_db_name,
     _control_engine
 )
 from .. import database as database_module
 from ..models import SessionInfo, Infringement, InfringementHistory
 from ..ws_manager import manager
 from ..vars import SESSION_EXPORT_DIR
-from ..utils import export_session_data, export_session_csv, export_session_excel, import_session_excel, import_session_csv, validate_session_name
+from ..utils import export_session_data, export_session_csv, export_session_excel, import_session_excel, import_session_csv, validate_session_name, infringement_category, parse_datetime
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 os.makedirs(SESSION_EXPORT_DIR, exist_ok=True)
 
+# Block size for copying an uploaded import file to disk
+UPLOAD_COPY_BUFSIZE = 1024 * 1024
+
 
 # -------------------------------------------------------------------
 # Create a new session
 # -------------------------------------------------------------------
 @router.post("/start")
-def start_session(name: str, background_tasks: BackgroundTasks = None):
+def start_session(name: str, background_tasks: BackgroundTasks = None, db: Session = Depends(get_control_db)):
     """
     Start a new session:
     - Create a per-session database
@@ -43,52 +50,48 @@ def start_session(name: str, background_tasks: BackgroundTasks = None):
     - Cannot contain consecutive spaces
     - Must start with a letter (after conversion to database name)
     """
-    db = ControlSessionLocal()
+    # --- Step 0: Validate session name ---
     try:
-        # --- Step 0: Validate session name ---
-        try:
-            validate_session_name(name)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-        
-        # --- Step 1: Create per-session DB ---
-        try:
-            create_session_db(name)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to create session DB: {e}")
+        validate_session_name(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # --- Step 1: Create per-session DB ---
+    try:
+        create_session_db(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create session DB: {e}")
 
-        # --- Step 2: Close all existing sessions ---
-        db.query(SessionInfo).update({SessionInfo.status: "closed"})
-        db.commit()
+    # --- Step 2: Close all existing sessions ---
+    # Only the active row needs changing; committed together with the new active record below
+    db.query(SessionInfo).filter(SessionInfo.status == "active").update({SessionInfo.status: "closed"}, synchronize_session=False)
 
-        # --- Step 3: Add new session record ---
-        session_info = SessionInfo(name=name, started_at=datetime.utcnow(), status="active")
-        db.add(session_info)
-        db.commit()
+    # --- Step 3: Add new session record ---
+    session_info = SessionInfo(name=name, started_at=datetime.utcnow(), status="active")
+    db.add(session_info)
+    db.commit()
 
-        # --- Step 4: Switch to new session DB ---
-        try:
-            switch_session_db(name)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to switch to session DB: {e}")
+    # --- Step 4: Switch to new session DB ---
+    try:
+        switch_session_db(name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to switch to session DB: {e}")
 
-        # --- Step 5: Broadcast update ---
-        payload_msg = {"type": "session_started", "session": {"name": name}}
-        if background_tasks:
-            background_tasks.add_task(manager.broadcast, json.dumps(payload_msg))
+    # --- Step 5: Broadcast update ---
+    payload_msg = {"type": "session_started", "session": {"name": name}}
+    if background_tasks:
+        background_tasks.add_task(manager.enqueue, payload_msg)
 
-        return {"status": "Session started", "session": {"name": name}}
-    finally:
-        db.close()
+    return {"status": "Session started", "session": {"name": name}}
 
 
 # -------------------------------------------------------------------
 # Load existing session
 # -------------------------------------------------------------------
 @router.post("/load")
-def load_session(name: str, background_tasks: BackgroundTasks = None):
+def load_session(name: str, background_tasks: BackgroundTasks = None, db: Session = Depends(get_control_db)):
     """
     Load an existing session:
     - Switch to the per-session DB
@@ -101,50 +104,46 @@ def load_session(name: str, background_tasks: BackgroundTasks = None):
     - Cannot contain consecutive spaces
     - Must start with a letter (after conversion to database name)
     """
-    db = ControlSessionLocal()
+    # --- Step 0: Validate session name ---
     try:
-        # --- Step 0: Validate session name ---
-        try:
-            validate_session_name(name)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-        
-        # --- Step 1: Switch DB ---
-        try:
-            switch_session_db(name)
-        except ValueError as e:
-            raise HTTPException(status_code=404, detail=str(e))
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to switch session DB: {e}")
+        validate_session_name(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # --- Step 1: Switch DB ---
+    try:
+        switch_session_db(name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to switch session DB: {e}")
 
-        # --- Step 2: Close existing sessions ---
-        db.query(SessionInfo).update({SessionInfo.status: "closed"})
-        db.commit()
+    # --- Step 2: Close existing sessions ---
+    # Only the active row needs changing; committed together with the new active record below
+    db.query(SessionInfo).filter(SessionInfo.status == "active").update({SessionInfo.status: "closed"}, synchronize_session=False)
 
-        # --- Step 3: Mark loaded session as active ---
-        session_info = db.query(SessionInfo).filter(SessionInfo.name == name).first()
-        if not session_info:
-            session_info = SessionInfo(name=name, started_at=datetime.utcnow(), status="active")
-            db.add(session_info)
-        else:
-            session_info.status = "active"
-        db.commit()
+    # --- Step 3: Mark loaded session as active ---
+    session_info = db.query(SessionInfo).filter(SessionInfo.name == name).first()
+    if not session_info:
+        session_info = SessionInfo(name=name, started_at=datetime.utcnow(), status="active")
+        db.add(session_info)
+    else:
+        session_info.status = "active"
+    db.commit()
 
-        # --- Step 4: Broadcast update ---
-        payload_msg = {"type": "session_loaded", "session": {"name": name}}
-        if background_tasks:
-            background_tasks.add_task(manager.broadcast, json.dumps(payload_msg))
+    # --- Step 4: Broadcast update ---
+    payload_msg = {"type": "session_loaded", "session": {"name": name}}
+    if background_tasks:
+        background_tasks.add_task(manager.enqueue, payload_msg)
 
-        return {"status": f"Session '{name}' loaded"}
-    finally:
-        db.close()
+    return {"status": f"Session '{name}' loaded"}
 
 
 # -------------------------------------------------------------------
 # Close active session
 # -------------------------------------------------------------------
 @router.post("/close")
-def close_session(name: str, background_tasks: BackgroundTasks = None):
+def close_session(name: str, background_tasks: BackgroundTasks = None, db: Session = Depends(get_control_db)):
     """
     Close an active session:
     - Marks session as closed in the control DB.
@@ -156,55 +155,48 @@ def close_session(name: str, background_tasks: BackgroundTasks = None):
     - Cannot contain consecutive spaces
     - Must start with a letter (after conversion to database name)
     """
-    db = ControlSessionLocal()
+    # --- Step 0: Validate session name ---
     try:
-        # --- Step 0: Validate session name ---
-        try:
-            validate_session_name(name)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-        
-        db.query(SessionInfo).filter(SessionInfo.name == name).update({SessionInfo.status: "closed"})
-        db.commit()
+        validate_session_name(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    db.query(SessionInfo).filter(SessionInfo.name == name).update({SessionInfo.status: "closed"}, synchronize_session=False)
+    db.commit()
+    invalidate_active_session_cache()
 
-        payload_msg = {"type": "session_closed", "session": {"name": name}}
-        if background_tasks:
-            background_tasks.add_task(manager.broadcast, json.dumps(payload_msg))
+    payload_msg = {"type": "session_closed", "session": {"name": name}}
+    if background_tasks:
+        background_tasks.add_task(manager.enqueue, payload_msg)
 
-        return {"status": f"Session '{name}' closed"}
-    finally:
-        db.close()
+    return {"status": f"Session '{name}' closed"}
 
 
 # -------------------------------------------------------------------
 # List all sessions
 # -------------------------------------------------------------------
 @router.get("/")
-def list_sessions():
+def list_sessions(db: Session = Depends(get_control_db)):
     """
     Fetch all sessions from the control DB.
     """
-    db = ControlSessionLocal()
-    try:
-        sessions = db.query(SessionInfo).order_by(SessionInfo.started_at.desc()).all()
-        return {
-            "sessions": [
-                {
-                    "name": s.name,
-                    "status": s.status,
-                    "started_at": s.started_at.isoformat() if s.started_at else None
-                } for s in sessions
-            ]
-        }
-    finally:
-        db.close()
+    sessions = db.query(SessionInfo).order_by(SessionInfo.started_at.desc()).all()
+    return {
+        "sessions": [
+            {
+                "name": s.name,
+                "status": s.status,
+                "started_at": s.started_at.isoformat() if s.started_at else None
+            } for s in sessions
+        ]
+    }
 
 
 # -------------------------------------------------------------------
 # Delete session (drops DB + removes record)
 # -------------------------------------------------------------------
 @router.delete("/delete")
-def delete_session(name: str, background_tasks: BackgroundTasks = None):
+def delete_session(name: str, background_tasks: BackgroundTasks = None, db: Session = Depends(get_control_db)):
     """
     Delete a session completely:
     - Drops the per-session database.
@@ -217,61 +209,59 @@ def delete_session(name: str, background_tasks: BackgroundTasks = None):
     - Cannot contain consecutive spaces
     - Must start with a letter (after conversion to database name)
     """
-    db = ControlSessionLocal()
+    # --- Step 0: Validate session name ---
     try:
-        # --- Step 0: Validate session name ---
-        try:
-            validate_session_name(name)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-        
-        session_db_name = f"{name.lower().replace(' ', '_')}_db"
+        validate_session_name(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    session_db_name = _session_db_name(name)
 
-        # --- Step 1: Drop the session database ---
-        try:
-            with _control_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
-                exists = conn.execute(
-                    text("SELECT 1 FROM pg_database WHERE datname=:name;"),
-                    {"name": session_db_name}
-                ).fetchone()
-
-                if not exists:
-                    raise HTTPException(status_code=404, detail=f"Session database '{session_db_name}' not found.")
-
-                conn.execute(
-                    text("""
-                    SELECT pg_terminate_backend(pid)
-                    FROM pg_stat_activity
-                    WHERE datname = :name;
-                    """),
-                    {"name": session_db_name}
-                )
-
-                conn.execute(text(f'DROP DATABASE "{session_db_name}";'))
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to delete session DB: {e}")
+    # --- Step 1: Drop the session database ---
+    dispose_session_engine(name)
+    try:
+        with _control_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM pg_database WHERE datname=:name;"),
+                {"name": session_db_name}
+            ).fetchone()
 
-        # --- Step 2: Remove record from control DB ---
-        db.query(SessionInfo).filter(SessionInfo.name == name).delete()
-        db.commit()
+            if not exists:
+                raise HTTPException(status_code=404, detail=f"Session database '{session_db_name}' not found.")
 
-        # --- Step 3: Broadcast deletion ---
-        payload_msg = {"type": "session_deleted", "session": {"name": name}}
-        if background_tasks:
-            background_tasks.add_task(manager.broadcast, json.dumps(payload_msg))
+            conn.execute(
+                text("""
+                SELECT pg_terminate_backend(pid)
+                FROM pg_stat_activity
+                WHERE datname = :name;
+                """),
+                {"name": session_db_name}
+            )
 
-        return {"status": f"Session '{name}' deleted successfully."}
-    finally:
-        db.close()
+            conn.execute(text(f'DROP DATABASE "{session_db_name}";'))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete session DB: {e}")
+
+    # --- Step 2: Remove record from control DB ---
+    db.query(SessionInfo).filter(SessionInfo.name == name).delete(synchronize_session=False)
+    db.commit()
+    invalidate_active_session_cache()
+
+    # --- Step 3: Broadcast deletion ---
+    payload_msg = {"type": "session_deleted", "session": {"name": name}}
+    if background_tasks:
+        background_tasks.add_task(manager.enqueue, payload_msg)
+
+    return {"status": f"Session '{name}' deleted successfully."}
 
 
 # -------------------------------------------------------------------
 # Export session data
 # -------------------------------------------------------------------
 @router.get("/export")
-def export_session(name: str, format: str = "json"):
+def export_session(name: str, format: str = "json", db: Session = Depends(get_control_db)):
     """
     Export session data in the specified format.
     
@@ -301,123 +291,173 @@ def export_session(name: str, format: str = "json"):
         raise HTTPException(status_code=400, detail=str(e))
     
     # Check if session exists
-    db = ControlSessionLocal()
+    session_info = db.query(SessionInfo).filter(SessionInfo.name == name).first()
+    if not session_info:
+        raise HTTPException(status_code=404, detail=f"Session '{name}' not found")
+    
+    # Read the session's database directly; the active session (and live writes) stay where they are
     try:
-        session_info = db.query(SessionInfo).filter(SessionInfo.name == name).first()
-        if not session_info:
-            raise HTTPException(status_code=404, detail=f"Session '{name}' not found")
-        
-        # Switch to session database
-        try:
-            logger.info(f"Export: Switching to session '{name}'")
-            switch_session_db(name)
-            logger.info(f"Export: Switch completed")
-        except ValueError as e:
-            raise HTTPException(status_code=404, detail=str(e))
+        session_db = open_session_db(name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    try:
+        # Log which database we're querying
+        db_url = str(session_db.bind.url) if hasattr(session_db.bind, 'url') else 'unknown'
+        logger.info(f"Export: Using database: {db_url}")
         
-        # Get session database connection (after switching, ActiveSessionLocal points to session DB)
-        # Access ActiveSessionLocal through the module to get the updated reference
-        session_db = database_module.ActiveSessionLocal()
-        try:
-            # Log which database we're querying
-            db_url = str(session_db.bind.url) if hasattr(session_db.bind, 'url') else 'unknown'
-            logger.info(f"Export: Using database: {db_url}")
-            
-            # First check count
+        # Count diagnostics are full-table scans; only run them when debugging
+        if logger.isEnabledFor(logging.DEBUG):
             count = session_db.query(Infringement).count()
-            logger.info(f"Export: Found {count} infringements in database")
+            logger.debug(f"Export: Found {count} infringements in database")
             
             # If count is 0, try direct SQL
             if count == 0:
                 sql_count = session_db.execute(text("SELECT COUNT(*) FROM infringements")).scalar()
                 logger.warning(f"Export: ORM count is 0 but SQL count is {sql_count}")
-            
-            # Fetch all infringements with history
-            infringements_query = session_db.query(Infringement).order_by(Infringement.timestamp.desc()).all()
-            logger.info(f"Export: Query returned {len(infringements_query)} infringements")
-            
-            infringements = []
-            for inf in infringements_query:
-                # Get history for this infringement
-                history = session_db.query(InfringementHistory).filter(
-                    InfringementHistory.infringement_id == inf.id
-                ).order_by(InfringementHistory.timestamp.desc()).all()
-                
-                inf_dict = {
-                    "id": inf.id,
-                    "kart_number": inf.kart_number,
-                    "turn_number": inf.turn_number,
-                    "description": inf.description,
-                    "observer": inf.observer,
-                    "warning_count": inf.warning_count,
-                    "penalty_due": inf.penalty_due,
-                    "penalty_description": inf.penalty_description,
-                    "penalty_taken": inf.penalty_taken.isoformat() if inf.penalty_taken else None,
-                    "timestamp": inf.timestamp.isoformat() if inf.timestamp else None,
-                    "history": [
-                        {
-                            "action": h.action,
-                            "performed_by": h.performed_by,
-                            "observer": h.observer,
-                            "details": h.details,
-                            "timestamp": h.timestamp.isoformat() if h.timestamp else None
-                        } for h in history
-                    ]
-                }
-                infringements.append(inf_dict)
-            
-            # Prepare session info
-            session_info_dict = {
-                "name": session_info.name,
-                "status": session_info.status,
-                "started_at": session_info.started_at.isoformat() if session_info.started_at else None
-            }
-            
-            # Export based on format
-            if format == "json":
-                export_data = {
-                    "session": session_info_dict,
-                    "infringements": infringements,
-                    "exported_at": datetime.utcnow().isoformat()
-                }
-                file_path = export_session_data(name, export_data)
-                media_type = "application/json"
-            elif format == "csv":
-                file_path = export_session_csv(name, infringements, session_info_dict)
-                media_type = "text/csv"
-            elif format == "excel":
-                file_path = export_session_excel(name, infringements, session_info_dict)
-                media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            
-            # Ensure file path is absolute
-            if not os.path.isabs(file_path):
-                file_path = os.path.abspath(file_path)
-            
-            # Verify file exists
-            if not os.path.exists(file_path):
-                raise HTTPException(status_code=500, detail=f"Exported file not found: {file_path}")
-            
-            # Return file for download
-            filename = os.path.basename(file_path)
-            return FileResponse(
-                path=file_path,
-                media_type=media_type,
-                filename=filename,
-                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        
+        # Plain column rows fetched 1000 at a time: no ORM instances or identity map for the whole session
+        # All history in one query, bucketed by infringement (every row in this DB belongs to one)
+        history_by_inf = defaultdict(list)
+        history_rows = session_db.execute(
+            select(
+                InfringementHistory.infringement_id,
+                InfringementHistory.action,
+                InfringementHistory.performed_by,
+                InfringementHistory.observer,
+                InfringementHistory.details,
+                InfringementHistory.timestamp,
             )
-        finally:
-            session_db.close()
+            .order_by(InfringementHistory.timestamp.desc())
+            .execution_options(yield_per=1000)
+        )
+        for h in history_rows:
+            history_by_inf[h.infringement_id].append({
+                "action": h.action,
+                "performed_by": h.performed_by,
+                "observer": h.observer,
+                "details": h.details,
+                "timestamp": h.timestamp.isoformat() if h.timestamp else None
+            })
+        
+        infringement_rows = session_db.execute(
+            select(
+                Infringement.id,
+                Infringement.kart_number,
+                Infringement.turn_number,
+                Infringement.description,
+                Infringement.observer,
+                Infringement.warning_count,
+                Infringement.penalty_due,
+                Infringement.penalty_description,
+                Infringement.penalty_taken,
+                Infringement.timestamp,
+            )
+            .order_by(Infringement.timestamp.desc())
+            .execution_options(yield_per=1000)
+        )
+        # The writers make separate passes for infringements and history, so the dicts are kept in a list
+        infringements = []
+        for inf in infringement_rows:
+            infringements.append({
+                "id": inf.id,
+                "kart_number": inf.kart_number,
+                "turn_number": inf.turn_number,
+                "description": inf.description,
+                "observer": inf.observer,
+                "warning_count": inf.warning_count,
+                "penalty_due": inf.penalty_due,
+                "penalty_description": inf.penalty_description,
+                "penalty_taken": inf.penalty_taken.isoformat() if inf.penalty_taken else None,
+                "timestamp": inf.timestamp.isoformat() if inf.timestamp else None,
+                "history": history_by_inf.get(inf.id, [])
+            })
+        logger.info(f"Export: Query returned {len(infringements)} infringements")
+        
+        # Prepare session info
+        session_info_dict = {
+            "name": session_info.name,
+            "status": session_info.status,
+            "started_at": session_info.started_at.isoformat() if session_info.started_at else None
+        }
+        
+        # Export based on format
+        if format == "json":
+            export_data = {
+                "session": session_info_dict,
+                "infringements": infringements,
+                "exported_at": datetime.utcnow().isoformat()
+            }
+            file_path = export_session_data(name, export_data)
+            media_type = "application/json"
+        elif format == "csv":
+            file_path = export_session_csv(name, infringements, session_info_dict)
+            media_type = "text/csv"
+        elif format == "excel":
+            file_path = export_session_excel(name, infringements, session_info_dict)
+            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        
+        # Ensure file path is absolute
+        if not os.path.isabs(file_path):
+            file_path = os.path.abspath(file_path)
+        
+        # Verify file exists; the stat result is handed to FileResponse so it doesn't stat again
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=500, detail=f"Exported file not found: {file_path}")
+        
+        # Return file for download (FileResponse sets Content-Disposition: attachment from filename)
+        filename = os.path.basename(file_path)
+        return FileResponse(
+            path=file_path,
+            stat_result=stat_result,
+            media_type=media_type,
+            filename=filename
+        )
     finally:
-        db.close()
+        session_db.close()
+        release_session_db(name)
 
 
 # -------------------------------------------------------------------
 # Import session data from Excel file
 # -------------------------------------------------------------------
+_IMPORT_INFRINGEMENT_COLUMNS = (
+    "id", "session_name", "kart_number", "turn_number", "description", "category", "observer",
+    "warning_count", "penalty_due", "penalty_description", "penalty_taken", "timestamp"
+)
+_IMPORT_HISTORY_COLUMNS = (
+    "session_name", "infringement_id", "action", "performed_by", "observer", "details", "timestamp"
+)
+
+def _copy_value(value) -> str:
+    """Encode one value for COPY's text format: \\N for NULL, with backslash, tab and newlines escaped."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+def _copy_rows(db: Session, table: str, columns: tuple, rows: list):
+    """Bulk-load rows (dicts keyed by column) with COPY FROM STDIN inside the session's transaction."""
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(row[col]) for col in columns))
+        buf.write("\n")
+    buf.seek(0)
+    # Raw psycopg2 connection behind the session's current transaction
+    with db.connection().connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
 @router.post("/import")
 def import_session(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    background_tasks: BackgroundTasks = None,
+    db: Session = Depends(get_control_db)
 ):
     """
     Import session data from an Excel file (.xlsx).
@@ -430,14 +470,14 @@ def import_session(
         raise HTTPException(status_code=400, detail="File must be an Excel file (.xlsx or .xls) or CSV file (.csv)")
     
     temp_file_path = None
-    db = ControlSessionLocal()
     try:
         # Determine file type and save to temporary location
         is_csv = file.filename.endswith('.csv')
         suffix = '.csv' if is_csv else '.xlsx'
         
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            shutil.copyfileobj(file.file, tmp_file)
+            # 1 MiB blocks instead of the default 64 KiB: far fewer read/write calls for multi-MB workbooks
+            shutil.copyfileobj(file.file, tmp_file, length=UPLOAD_COPY_BUFSIZE)
             temp_file_path = tmp_file.name
         
         # Parse file based on type
@@ -471,17 +511,15 @@ def import_session(
         except ValueError as e:
             raise HTTPException(status_code=400, detail=f"Invalid session name from file: {str(e)}")
         
-        # Check if session already exists
-        existing_session = db.query(SessionInfo).filter(SessionInfo.name == session_name).first()
-        session_db_name = f"{session_name.lower().replace(' ', '_')}_db"
-        
-        # Check if database exists (even if session record doesn't)
-        from ..database import _control_engine
-        with _control_engine.connect() as conn:
-            db_exists = conn.execute(
-                text("SELECT 1 FROM pg_database WHERE datname=:name;"),
-                {"name": session_db_name}
-            ).fetchone()
+        # Check if the session record or its database exists (either one blocks the import), in one round trip
+        session_db_name = _session_db_name(session_name)
+        existing_session, db_exists = db.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM sessions WHERE name = :session_name), "
+                "EXISTS (SELECT 1 FROM pg_database WHERE datname = :db_name)"
+            ),
+            {"session_name": session_name, "db_name": session_db_name}
+        ).one()
         
         if existing_session or db_exists:
             raise HTTPException(
@@ -498,15 +536,15 @@ def import_session(
             raise HTTPException(status_code=500, detail=f"Failed to create session DB: {e}")
         
         # --- Step 2: Close all existing sessions ---
-        db.query(SessionInfo).update({SessionInfo.status: "closed"})
-        db.commit()
+        # Only the active row needs changing; committed together with the new active record below
+        db.query(SessionInfo).filter(SessionInfo.status == "active").update({SessionInfo.status: "closed"}, synchronize_session=False)
         
         # --- Step 3: Parse started_at date if provided ---
         started_at = None
         if session_info.get("started_at"):
             try:
                 if isinstance(session_info["started_at"], str):
-                    started_at = date_parser.parse(session_info["started_at"])
+                    started_at = parse_datetime(session_info["started_at"])
                 else:
                     started_at = session_info["started_at"]
             except:
@@ -532,92 +570,109 @@ def import_session(
         # --- Step 6: Import infringements and history ---
         session_db = database_module.ActiveSessionLocal()
         try:
-            imported_count = 0
-            history_count = 0
+            # Fallback for rows without a usable timestamp; taken once for the whole import
+            import_now = datetime.now(timezone.utc)
             
+            # Pass 1: build every infringement row; history is kept alongside until the new IDs are known
+            inf_rows = []
+            inf_histories = []
             for inf_data in infringements:
                 # Parse timestamp
                 timestamp = None
                 if inf_data.get("timestamp"):
                     try:
                         if isinstance(inf_data["timestamp"], str):
-                            timestamp = date_parser.parse(inf_data["timestamp"])
+                            timestamp = parse_datetime(inf_data["timestamp"])
                         else:
                             timestamp = inf_data["timestamp"]
                     except:
-                        timestamp = datetime.now(timezone.utc)
+                        timestamp = import_now
                 else:
-                    timestamp = datetime.now(timezone.utc)
+                    timestamp = import_now
                 
                 # Parse penalty_taken
                 penalty_taken = None
                 if inf_data.get("penalty_taken"):
                     try:
                         if isinstance(inf_data["penalty_taken"], str):
-                            penalty_taken = date_parser.parse(inf_data["penalty_taken"])
+                            penalty_taken = parse_datetime(inf_data["penalty_taken"])
                         else:
                             penalty_taken = inf_data["penalty_taken"]
                     except:
                         penalty_taken = None
                 
-                # Create infringement (ignore original ID, let DB assign new ones)
-                new_inf = Infringement(
-                    session_name=session_name,
-                    kart_number=inf_data.get("kart_number"),
-                    turn_number=inf_data.get("turn_number"),
-                    description=inf_data.get("description", ""),
-                    observer=inf_data.get("observer"),
-                    warning_count=inf_data.get("warning_count", 0),
-                    penalty_due=inf_data.get("penalty_due", "No"),
-                    penalty_description=inf_data.get("penalty_description"),
-                    penalty_taken=penalty_taken,
-                    timestamp=timestamp
-                )
-                session_db.add(new_inf)
-                session_db.flush()  # Get the new ID
-                
-                # Import history for this infringement
-                history_list = inf_data.get("history", [])
+                # Ignore the original ID, let DB assign new ones
+                inf_rows.append({
+                    "session_name": session_name,
+                    "kart_number": inf_data.get("kart_number"),
+                    "turn_number": inf_data.get("turn_number"),
+                    "description": inf_data.get("description", ""),
+                    "category": infringement_category(inf_data.get("description", "")),
+                    "observer": inf_data.get("observer"),
+                    "warning_count": inf_data.get("warning_count", 0),
+                    "penalty_due": inf_data.get("penalty_due", "No"),
+                    "penalty_description": inf_data.get("penalty_description"),
+                    "penalty_taken": penalty_taken,
+                    "timestamp": timestamp
+                })
+                inf_histories.append(inf_data.get("history", []))
+            
+            # Reserve IDs from the serial sequence in one round trip so history rows can point at
+            # them, then bulk-load both tables with COPY instead of per-row INSERT statements
+            new_ids = []
+            if inf_rows:
+                new_ids = session_db.execute(
+                    text("SELECT nextval(pg_get_serial_sequence('infringements', 'id')) FROM generate_series(1, :n)"),
+                    {"n": len(inf_rows)}
+                ).scalars().all()
+                for new_id, row in zip(new_ids, inf_rows):
+                    row["id"] = new_id
+                _copy_rows(session_db, Infringement.__tablename__, _IMPORT_INFRINGEMENT_COLUMNS, inf_rows)
+            
+            # Pass 2: history rows, pointed at the new infringement IDs
+            hist_rows = []
+            for new_id, history_list in zip(new_ids, inf_histories):
                 for hist_data in history_list:
                     # Parse history timestamp
                     hist_timestamp = None
                     if hist_data.get("timestamp"):
                         try:
                             if isinstance(hist_data["timestamp"], str):
-                                hist_timestamp = date_parser.parse(hist_data["timestamp"])
+                                hist_timestamp = parse_datetime(hist_data["timestamp"])
                             else:
                                 hist_timestamp = hist_data["timestamp"]
                         except:
-                            hist_timestamp = datetime.now(timezone.utc)
+                            hist_timestamp = import_now
                     else:
-                        hist_timestamp = datetime.now(timezone.utc)
+                        hist_timestamp = import_now
                     
-                    new_hist = InfringementHistory(
-                        session_name=session_name,
-                        infringement_id=new_inf.id,
-                        action=hist_data.get("action", ""),
-                        performed_by=hist_data.get("performed_by", ""),
-                        observer=hist_data.get("observer"),
-                        details=hist_data.get("details"),
-                        timestamp=hist_timestamp
-                    )
-                    session_db.add(new_hist)
-                    history_count += 1
-                
-                imported_count += 1
+                    hist_rows.append({
+                        "session_name": session_name,
+                        "infringement_id": new_id,
+                        "action": hist_data.get("action", ""),
+                        "performed_by": hist_data.get("performed_by", ""),
+                        "observer": hist_data.get("observer"),
+                        "details": hist_data.get("details"),
+                        "timestamp": hist_timestamp
+                    })
+            if hist_rows:
+                _copy_rows(session_db, InfringementHistory.__tablename__, _IMPORT_HISTORY_COLUMNS, hist_rows)
+            
+            imported_count = len(new_ids)
+            history_count = len(hist_rows)
             
             session_db.commit()
             logger.info(f"Committed {imported_count} infringements and {history_count} history records to database")
             
-            # Verify data was saved - refresh the session to ensure we see committed data
-            session_db.expire_all()
-            verify_count = session_db.query(Infringement).count()
-            logger.info(f"Verification: {verify_count} infringements found in database after import (expected {imported_count})")
-            
-            if verify_count != imported_count:
-                logger.warning(f"Import count mismatch: imported {imported_count} but found {verify_count} in database")
-            else:
-                logger.info(f"✓ Import verification successful: {verify_count} infringements confirmed in database")
+            # Verify data was saved (a full-table COUNT, so only when debugging)
+            if logger.isEnabledFor(logging.DEBUG):
+                verify_count = session_db.query(Infringement).count()
+                logger.debug(f"Verification: {verify_count} infringements found in database after import (expected {imported_count})")
+                
+                if verify_count != imported_count:
+                    logger.warning(f"Import count mismatch: imported {imported_count} but found {verify_count} in database")
+                else:
+                    logger.debug(f"✓ Import verification successful: {verify_count} infringements confirmed in database")
         except Exception as e:
             session_db.rollback()
             raise HTTPException(status_code=500, detail=f"Failed to import data: {str(e)}")
@@ -625,48 +680,31 @@ def import_session(
             session_db.close()
             logger.info(f"Closed import session, data should be committed and visible to new connections")
         
-        # --- Step 8: Force engine reset and verify with completely fresh connection ---
-        # This ensures any cached connections are cleared
-        logger.info(f"Resetting engine and verifying data with fresh connection...")
-        
-        # Force dispose of current engine to clear all connections
-        from ..database import _active_engine, _control_engine
-        if _active_engine is not None and _active_engine is not _control_engine:
+        # --- Step 8: Verify the import from a new session ---
+        # The import session committed, so any connection from the pool sees the rows (MVCC); no engine reset needed
+        # Full-table reads, so only when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            verify_db = database_module.ActiveSessionLocal()
             try:
-                _active_engine.dispose(close=True)
-                logger.info("Disposed of active engine to clear connection pool")
-            except Exception as e:
-                logger.warning(f"Error disposing engine: {e}")
-        
-        # Re-switch to create a completely fresh engine
-        try:
-            switch_session_db(session_name)
-            logger.info(f"Created fresh engine for session '{session_name}'")
-        except Exception as e:
-            logger.warning(f"Could not re-switch session: {e}")
-        
-        # Now verify with a completely fresh session from the new engine
-        verify_db = database_module.ActiveSessionLocal()
-        try:
-            # Use a direct SQL query to bypass any ORM caching
-            sql_count = verify_db.execute(text("SELECT COUNT(*) FROM infringements")).scalar()
-            logger.info(f"Post-import SQL verification: {sql_count} infringements in database")
+                # Use a direct SQL query to bypass any ORM caching
+                sql_count = verify_db.execute(text("SELECT COUNT(*) FROM infringements")).scalar()
+                logger.debug(f"Post-import SQL verification: {sql_count} infringements in database")
             
-            # Also try ORM query
-            all_infs = verify_db.query(Infringement).all()
-            verify_count = len(all_infs)
-            logger.info(f"Post-import ORM verification: {verify_count} infringements accessible via ActiveSessionLocal")
+                # Also try ORM query
+                all_infs = verify_db.query(Infringement).all()
+                verify_count = len(all_infs)
+                logger.debug(f"Post-import ORM verification: {verify_count} infringements accessible via ActiveSessionLocal")
             
-            if verify_count > 0:
-                logger.info(f"✓ Verification successful: Sample infringement ID={all_infs[0].id}, kart={all_infs[0].kart_number}")
-            elif sql_count > 0:
-                logger.error(f"⚠️ SQL shows {sql_count} infringements but ORM shows 0 - ORM caching issue!")
-            else:
-                logger.error(f"⚠️ CRITICAL: No infringements found in database after import! Expected {imported_count}, SQL count: {sql_count}")
-        except Exception as e:
-            logger.error(f"Error verifying imported data: {e}", exc_info=True)
-        finally:
-            verify_db.close()
+                if verify_count > 0:
+                    logger.debug(f"✓ Verification successful: Sample infringement ID={all_infs[0].id}, kart={all_infs[0].kart_number}")
+                elif sql_count > 0:
+                    logger.error(f"⚠️ SQL shows {sql_count} infringements but ORM shows 0 - ORM caching issue!")
+                else:
+                    logger.error(f"⚠️ CRITICAL: No infringements found in database after import! Expected {imported_count}, SQL count: {sql_count}")
+            except Exception as e:
+                logger.error(f"Error verifying imported data: {e}", exc_info=True)
+            finally:
+                verify_db.close()
         
         # --- Step 9: Broadcast update ---
         payload_msg = {
@@ -675,7 +713,7 @@ def import_session(
             "imported": {"infringements": imported_count, "history": history_count}
         }
         if background_tasks:
-            background_tasks.add_task(manager.broadcast, json.dumps(payload_msg))
+            background_tasks.add_task(manager.enqueue, payload_msg)
         
         logger.info(f"Import complete: {imported_count} infringements, {history_count} history records for session '{session_name}'")
         
@@ -694,4 +732,3 @@ def import_session(
                 os.unlink(temp_file_path)
             except:
                 pass
-        db.close()
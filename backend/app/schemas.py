@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Union
 from datetime import datetime
 
@@ -28,8 +28,7 @@ class InfringementResponse(BaseModel):
     penalty_taken: Optional[datetime]
     timestamp: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class InfringementHistoryResponse(BaseModel):
     id: int
@@ -40,8 +39,7 @@ class InfringementHistoryResponse(BaseModel):
     details: Optional[str]
     timestamp: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ApplyPenaltyResponse(BaseModel):
     kart_number: int
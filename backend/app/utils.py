@@ -1,6 +1,8 @@
 import os
+import re
 import logging
 from datetime import datetime, timezone
+from fastapi import HTTPException, status
 
 # Directory to store exported session JSONs (if needed)
 # Use absolute path to avoid issues in Docker
@@ -135,6 +137,70 @@ def utc_now() -> datetime:
     """
     return datetime.now(timezone.utc)
 
+def parse_datetime(value: str) -> datetime:
+    """
+    Parse a timestamp string, trying datetime.fromisoformat before dateutil.
+    Our exports write isoformat() strings, so imports almost always take the fast path.
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        from dateutil import parser as date_parser
+        return date_parser.parse(value)
+
+# Infringement categories (stored on Infringement.category)
+WHITE_LINE = "white_line"
+YELLOW_ZONE = "yellow_zone"
+OTHER = "other"
+
+# Case-insensitive matches that don't allocate a lowercased copy of the description
+_WHITE_LINE_RE = re.compile("white line infringement", re.IGNORECASE)
+_YELLOW_ZONE_RE = re.compile("yellow zone", re.IGNORECASE)
+
+def infringement_category(description: str) -> str:
+    """
+    Classify an infringement description for warning accumulation.
+    Stored at write time so queries filter on an indexed column instead of ILIKE.
+    """
+    if not description:
+        return OTHER
+    if _WHITE_LINE_RE.search(description):
+        return WHITE_LINE
+    if _YELLOW_ZONE_RE.search(description):
+        return YELLOW_ZONE
+    return OTHER
+
+# PostgreSQL SQLSTATE codes (psycopg2 exposes them as e.orig.pgcode)
+PG_UNDEFINED_TABLE = "42P01"
+PG_MISSING_OBJECT_CODES = ("42703", "3D000")  # undefined_column, invalid_catalog_name
+
+def handle_db_error(e: Exception):
+    """Handle database errors and return user-friendly HTTP exceptions."""
+    pgcode = getattr(getattr(e, "orig", None), "pgcode", None)
+    if pgcode is not None:
+        undefined_table = pgcode == PG_UNDEFINED_TABLE
+        missing_object = pgcode in PG_MISSING_OBJECT_CODES
+    else:
+        # No SQLSTATE (e.g. connection-level errors): fall back to the message text
+        error_str = str(e).lower()
+        undefined_table = "relation" in error_str and "does not exist" in error_str
+        missing_object = "does not exist" in error_str
+    if undefined_table:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No active session. Please create or load a session first."
+        )
+    elif missing_object:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Database error: Table does not exist. Please ensure a session is active."
+        )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
 def export_session_data(session_name: str, data: dict) -> str:
     """
     Export session data to a JSON file in SESSION_EXPORT_DIR.
@@ -365,7 +431,6 @@ def import_session_excel(file_path: str) -> dict:
     - Sheet "History" (optional): Headers, then history data rows
     """
     from openpyxl import load_workbook
-    from dateutil import parser as date_parser
     
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Excel file '{file_path}' does not exist.")
@@ -399,7 +464,7 @@ def import_session_excel(file_path: str) -> dict:
                     if isinstance(cell_b, datetime):
                         session_info["started_at"] = cell_b.isoformat()
                     else:
-                        session_info["started_at"] = date_parser.parse(str(cell_b)).isoformat()
+                        session_info["started_at"] = parse_datetime(str(cell_b)).isoformat()
                 except:
                     session_info["started_at"] = str(cell_b)
     
@@ -473,7 +538,7 @@ def import_session_excel(file_path: str) -> dict:
                         if isinstance(cell_value, datetime):
                             inf[field_name] = cell_value.isoformat()
                         else:
-                            inf[field_name] = date_parser.parse(str(cell_value)).isoformat()
+                            inf[field_name] = parse_datetime(str(cell_value)).isoformat()
                     except:
                         inf[field_name] = str(cell_value) if cell_value else None
                 else:
@@ -543,7 +608,7 @@ def import_session_excel(file_path: str) -> dict:
                                 if isinstance(cell_value, datetime):
                                     hist[field_name] = cell_value.isoformat()
                                 else:
-                                    hist[field_name] = date_parser.parse(str(cell_value)).isoformat()
+                                    hist[field_name] = parse_datetime(str(cell_value)).isoformat()
                             except:
                                 hist[field_name] = str(cell_value) if cell_value else None
                         else:
@@ -586,7 +651,6 @@ def import_session_csv(file_path: str) -> dict:
     Expected format matches export_session_csv output.
     """
     import csv
-    from dateutil import parser as date_parser
     
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"CSV file '{file_path}' does not exist.")
@@ -687,7 +751,7 @@ def import_session_csv(file_path: str) -> dict:
             elif field_name in ["penalty_taken", "timestamp"]:
                 if value:
                     try:
-                        inf[field_name] = date_parser.parse(value).isoformat()
+                        inf[field_name] = parse_datetime(value).isoformat()
                     except:
                         inf[field_name] = value
                 else:
@@ -751,7 +815,7 @@ def import_session_csv(file_path: str) -> dict:
                     elif field_name == "timestamp":
                         if value:
                             try:
-                                hist[field_name] = date_parser.parse(value).isoformat()
+                                hist[field_name] = parse_datetime(value).isoformat()
                             except:
                                 hist[field_name] = value
                         else:
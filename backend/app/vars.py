@@ -1,12 +1,23 @@
 import os
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timezone, timedelta
 from .database import ControlSessionLocal
 from .models import AppConfig
 
 SESSION_EXPORT_DIR = os.environ.get("SESSION_EXPORT_DIR", "session_exports")
 
-def get_warning_expiry_minutes() -> int:
-    """Get warning expiry minutes from database, fallback to env var or default."""
+# Warning expiry is read on every infringement write but changes rarely;
+# cache it for a short TTL. set_warning_expiry_minutes() refreshes it immediately.
+WARNING_EXPIRY_CACHE_TTL = float(os.environ.get("WARNING_EXPIRY_CACHE_TTL", "30"))
+_warning_expiry_cache = {"value": None, "delta": None, "checked_at": 0.0}
+
+def _update_warning_expiry_cache(minutes: int):
+    _warning_expiry_cache["value"] = minutes
+    _warning_expiry_cache["delta"] = timedelta(minutes=minutes)
+    _warning_expiry_cache["checked_at"] = time.monotonic()
+
+def _load_warning_expiry_minutes() -> int:
+    """Read warning expiry minutes from database, fallback to env var or default."""
     try:
         db = ControlSessionLocal()
         try:
@@ -17,10 +28,22 @@ def get_warning_expiry_minutes() -> int:
             db.close()
     except Exception:
         pass
-    
+
     # Fallback to environment variable or default
     return int(os.environ.get("WARNING_EXPIRY_MINUTES", "180"))
 
+def get_warning_expiry_minutes() -> int:
+    """Get warning expiry minutes, re-reading the database at most once per WARNING_EXPIRY_CACHE_TTL."""
+    if (_warning_expiry_cache["value"] is None
+            or time.monotonic() - _warning_expiry_cache["checked_at"] >= WARNING_EXPIRY_CACHE_TTL):
+        _update_warning_expiry_cache(_load_warning_expiry_minutes())
+    return _warning_expiry_cache["value"]
+
+def get_warning_expiry() -> timedelta:
+    """Warning expiry as a timedelta, built once per cache refresh rather than on every write."""
+    get_warning_expiry_minutes()
+    return _warning_expiry_cache["delta"]
+
 def set_warning_expiry_minutes(minutes: int) -> None:
     """Set warning expiry minutes in database."""
     db = ControlSessionLocal()
@@ -35,3 +58,4 @@ def set_warning_expiry_minutes(minutes: int) -> None:
         db.commit()
     finally:
         db.close()
+    _update_warning_expiry_cache(minutes)
@@ -1,5 +1,6 @@
 # === FILE: app/ws_manager.py ===
-import json
+import orjson
+import os
 import logging
 from typing import List
 from fastapi import WebSocket
@@ -7,10 +8,25 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Events enqueued within this window are sent to clients as one frame
+BROADCAST_BATCH_INTERVAL = float(os.getenv("WS_BATCH_INTERVAL", "0.05"))
+BROADCAST_BATCH_MAX = int(os.getenv("WS_BATCH_MAX", "100"))
+# Bound on events waiting for the flusher; enqueue() waits for room instead of growing without limit
+BROADCAST_QUEUE_MAX = int(os.getenv("WS_QUEUE_MAX", "1000"))
+# Clients are sent to concurrently in slices of this size, yielding to the event loop between slices
+BROADCAST_SEND_BATCH_SIZE = int(os.getenv("WS_SEND_BATCH_SIZE", "50"))
+# A client that can't take a frame within this many seconds is dropped rather than stalling the broadcast
+BROADCAST_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "1.0"))
+
+# Batch frames are assembled from already-serialized events inside this fixed envelope
+_BATCH_PREFIX = b'{"type":"batch","events":['
+_BATCH_SUFFIX = b']}'
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.lock = asyncio.Lock()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=BROADCAST_QUEUE_MAX)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
@@ -29,6 +45,17 @@ class ConnectionManager:
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
+    async def _send_or_drop(self, connection: WebSocket, message: str):
+        """Send one frame, closing the client if it doesn't accept it within BROADCAST_SEND_TIMEOUT."""
+        try:
+            await asyncio.wait_for(connection.send_text(message), timeout=BROADCAST_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            try:
+                await asyncio.wait_for(connection.close(code=1013), timeout=BROADCAST_SEND_TIMEOUT)
+            except Exception:
+                pass
+            raise
+
     async def broadcast(self, message: str):
         # copy list under lock then send without holding the lock to avoid deadlocks
         async with self.lock:
@@ -41,12 +68,22 @@ class ConnectionManager:
         
         logger.info(f"Broadcasting message to {connection_count} WebSocket client(s)")
         disconnected = []
-        for connection in connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.warning(f"Failed to send message to WebSocket client: {e}")
-                disconnected.append(connection)
+        # Text frames: the browser client JSON.parses event.data, which a binary frame would turn into a Blob
+        for start in range(0, connection_count, BROADCAST_SEND_BATCH_SIZE):
+            batch = connections[start:start + BROADCAST_SEND_BATCH_SIZE]
+            results = await asyncio.gather(
+                *(self._send_or_drop(connection, message) for connection in batch),
+                return_exceptions=True
+            )
+            for connection, result in zip(batch, results):
+                if isinstance(result, asyncio.TimeoutError):
+                    logger.warning(f"Dropping WebSocket client that did not accept a message within {BROADCAST_SEND_TIMEOUT}s")
+                    disconnected.append(connection)
+                elif isinstance(result, Exception):
+                    logger.warning(f"Failed to send message to WebSocket client: {result}")
+                    disconnected.append(connection)
+            # Let other requests run between slices when many clients are connected
+            await asyncio.sleep(0)
         if disconnected:
             async with self.lock:
                 for d in disconnected:
@@ -56,5 +93,30 @@ class ConnectionManager:
                         pass
             logger.info(f"Removed {len(disconnected)} disconnected client(s). Remaining: {len(self.active_connections)}")
 
+    async def enqueue(self, event: dict):
+        """Serialize an event once and queue it for the next coalesced broadcast (see run_flusher)."""
+        # Naive datetimes (e.g. utcnow() values) are UTC throughout this app; mark them as such
+        await self.queue.put(orjson.dumps(event, option=orjson.OPT_NAIVE_UTC))
+
+    async def run_flusher(self):
+        """
+        Drain queued events and broadcast them in batches.
+        A lone event is sent as-is; a burst goes out as {"type": "batch", "events": [...]}.
+        """
+        while True:
+            batch = [await self.queue.get()]
+            # Give the rest of a burst a moment to arrive
+            await asyncio.sleep(BROADCAST_BATCH_INTERVAL)
+            while len(batch) < BROADCAST_BATCH_MAX and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            if len(batch) == 1:
+                message = batch[0].decode()
+            else:
+                message = (_BATCH_PREFIX + b",".join(batch) + _BATCH_SUFFIX).decode()
+            try:
+                await self.broadcast(message)
+            except Exception as e:
+                logger.error(f"Error broadcasting batched events: {e}", exc_info=True)
+
 
 manager = ConnectionManager()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+import pytest
+
+# app.database reads DATABASE_URL at import; route tests run against SQLite and never touch it
+_TMP_DIR = tempfile.mkdtemp(prefix="racelith-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP_DIR}/control.db")
+os.environ.setdefault("SESSION_EXPORT_DIR", os.path.join(_TMP_DIR, "exports"))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.base import Base
+from app.database import get_session_db, get_session_db_readonly
+from app.routes import infringements, penalties
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """A fresh session database with the per-session tables."""
+    engine = create_engine(f"sqlite:///{tmp_path}/session.db")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def client(session_factory):
+    """The infringement and penalty routers, bound to the test session database."""
+    app = FastAPI()
+    app.include_router(infringements.router, prefix="/infringements")
+    app.include_router(penalties.router, prefix="/penalties")
+
+    def override_session_db():
+        db = session_factory()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_session_db] = override_session_db
+    app.dependency_overrides[get_session_db_readonly] = override_session_db
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,22 @@
+from sqlalchemy import create_engine, event, text
+
+from app.database import _trim_pool
+
+
+def test_trim_pool_keeps_one_warm_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/session.db", pool_size=5, max_overflow=5, pool_use_lifo=True)
+    opened = []
+    event.listen(engine, "connect", lambda dbapi_conn, record: opened.append(dbapi_conn))
+    event.listen(engine, "close", lambda dbapi_conn, record: opened.remove(dbapi_conn))
+    connections = [engine.connect() for _ in range(4)]
+    for conn in connections:
+        conn.close()
+
+    _trim_pool(engine)
+
+    assert len(opened) == 1
+    # The warm connection is handed out first, so using the engine again doesn't reconnect
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert len(opened) == 1
+    engine.dispose()
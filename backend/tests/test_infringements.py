@@ -0,0 +1,29 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from app.models import Infringement
+
+
+def test_stream_infringements_yields_rows_newest_first(client, session_factory):
+    now = datetime.now(timezone.utc)
+    db = session_factory()
+    try:
+        db.add_all([
+            Infringement(
+                session_name="test", kart_number=kart, turn_number="3", description="Yellow Zone",
+                category="yellow_zone", warning_count=1, penalty_due="No", penalty_description="Warning",
+                timestamp=now - timedelta(minutes=minutes_ago)
+            )
+            for kart, minutes_ago in ((5, 2), (9, 1))
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    with client.stream("GET", "/infringements/stream") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert [row["kart_number"] for row in rows] == [9, 5]
+    assert rows[0]["penalty_description"] == "Warning"
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+
+from app.models import Infringement
+
+
+def _add_infringement(session_factory, **values):
+    db = session_factory()
+    try:
+        inf = Infringement(
+            session_name="test",
+            description=values.pop("description", "White Line Infringement"),
+            category=values.pop("category", "white_line"),
+            timestamp=datetime.now(timezone.utc),
+            **values
+        )
+        db.add(inf)
+        db.commit()
+        return inf.id
+    finally:
+        db.close()
+
+
+def test_apply_penalties_for_kart_clears_pending(client, session_factory):
+    pending_id = _add_infringement(
+        session_factory, kart_number=7, warning_count=3, penalty_due="Yes", penalty_description="Drive Through"
+    )
+    other_kart_id = _add_infringement(
+        session_factory, kart_number=8, warning_count=3, penalty_due="Yes", penalty_description="Drive Through"
+    )
+
+    response = client.post("/penalties/apply/7", json={"performed_by": "steward"})
+
+    assert response.status_code == 200
+    assert response.json()["kart_number"] == 7
+    db = session_factory()
+    try:
+        applied = db.get(Infringement, pending_id)
+        assert applied.penalty_due == "No"
+        assert applied.penalty_taken is not None
+        assert applied.warning_count == 0  # white line warnings reset
+        assert db.get(Infringement, other_kart_id).penalty_due == "Yes"
+    finally:
+        db.close()
+
+
+def test_apply_penalties_for_kart_without_pending(client, session_factory):
+    _add_infringement(session_factory, kart_number=7, warning_count=1, penalty_due="No", penalty_description="Warning")
+
+    response = client.post("/penalties/apply/7", json={"performed_by": "steward"})
+
+    assert response.status_code == 400
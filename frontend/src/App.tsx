@@ -32,7 +32,7 @@ import {
   getConfig,
   updateConfig,
 } from './api';
-import { wsManager } from './websocket';
+import { messageEvents, wsManager } from './websocket';
 import type {
   CreateInfringementPayload,
   InfringementRecord,
@@ -196,7 +196,8 @@ export default function App() {
         'session_deleted',
         'session_imported',
       ]);
-      if (message?.type && relevantTypes.has(message.type)) {
+      // One reload per frame, however many events a batch carries
+      if (message?.type && messageEvents(message).some((ev) => relevantTypes.has(ev.type))) {
         // Use loadData from closure - don't include in dependencies to prevent reconnections
         void loadData(false);
       }
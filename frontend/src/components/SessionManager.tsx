@@ -35,7 +35,7 @@ import {
   importSession,
   type SessionSummary,
 } from '../api';
-import { wsManager } from '../websocket';
+import { messageEvents, wsManager } from '../websocket';
 
 interface SessionManagerProps {
   onSessionChange?: () => void;
@@ -85,7 +85,7 @@ export function SessionManager({ onSessionChange, onSessionSelected, onSessionCr
         'session_deleted',
         'session_imported',
       ]);
-      if (message?.type && sessionEventTypes.has(message.type)) {
+      if (message?.type && messageEvents(message).some((ev) => sessionEventTypes.has(ev.type))) {
         // Use loadSessions from closure - don't include in dependencies to prevent reconnections
         void loadSessions();
       }
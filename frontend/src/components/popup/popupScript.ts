@@ -592,7 +592,8 @@ export function generatePopupScript(apiBase: string, warningExpiryMinutes: numbe
     socket.onmessage = function(e) {
       try {
         const message = JSON.parse(e.data);
-        if (["new_infringement", "update_infringement", "delete_infringement", "penalty_applied"].includes(message.type)) {
+        const events = message.type === "batch" && Array.isArray(message.events) ? message.events : [message];
+        if (events.some((ev: any) => ["new_infringement", "update_infringement", "delete_infringement", "penalty_applied"].includes(ev.type))) {
           refreshTable();
         }
       } catch (error) {
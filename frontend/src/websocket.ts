@@ -15,17 +15,27 @@ type WebSocketMessageType =
   | 'session_loaded'
   | 'session_closed'
   | 'session_deleted'
-  | 'session_imported';
+  | 'session_imported'
+  | 'batch';
 
 export interface WebSocketMessage {
   type: WebSocketMessageType;
   data?: any;
   session?: { name: string };
   imported?: { infringements: number; history: number };
+  events?: WebSocketMessage[];
 }
 
 type MessageHandler = (message: WebSocketMessage) => void;
 
+/**
+ * The events carried by a message: the backend coalesces bursts into one "batch" frame,
+ * which handlers receive once so they can react to the whole burst with a single reload.
+ */
+export function messageEvents(message: WebSocketMessage): WebSocketMessage[] {
+  return message.type === 'batch' && Array.isArray(message.events) ? message.events : [message];
+}
+
 class WebSocketManager {
   private socket: WebSocket | null = null;
   private reconnectTimeout: ReturnType<typeof setTimeout> | null = null;
@@ -93,7 +103,7 @@ class WebSocketManager {
           if (message.type !== 'connected') {
             console.log('[WebSocket] Message received:', message.type);
           }
-          // Notify all handlers
+          // Notify all handlers; batch frames are delivered whole (see messageEvents)
           this.handlers.forEach((handler) => {
             try {
               handler(message);